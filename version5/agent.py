@@ -1,3 +1,5 @@
+import numpy as np
+
 from version5.core import Environment
 from version5.policy import Policy
 
@@ -7,12 +9,15 @@ class Agent:
         Agent class that learns a policy in a certain environment
     """
 
-    def __init__(self, env: Environment):
+    def __init__(self, env: Environment, seed=None):
         """
         Create a new Agent
         :param env: The environment the agent should learn in
+        :param seed: Seed of the agent's random number generator. Can be an int, a SeedSequence or a numpy Generator.
+                     If left unspecified, the generator is seeded randomly
         """
         self.env = env
+        self.rng = np.random.default_rng(seed)
 
     def learn(self) -> Policy:
         """
@@ -1,11 +1,10 @@
-from collections import deque
-
 import numpy as np
 
 from version5.agent import Agent
 from version5.core import FiniteActionEnvironment
 from version5.policy import EpsilonGreedyPolicy
 from version5.q_network import QNetwork
+from version5.replay_buffer import ReplayBuffer
 
 
 class DeepQLearning(Agent):
@@ -13,21 +12,26 @@ class DeepQLearning(Agent):
         Deep Q Learning algorithm implementation
     """
 
-    def __init__(self, env: FiniteActionEnvironment, q_network: QNetwork, gamma: float = 1.0, minibatch_size: int = 32):
+    def __init__(self, env: FiniteActionEnvironment, q_network: QNetwork, gamma: float = 1.0, minibatch_size: int = 32,
+                 replay_memory: ReplayBuffer = None, seed=None):
         """
         Create a new Deep Q Learning agent
         :param env: The environment the algorithm is subjected to
         :param q_network: The neural network used in this procedure
         :param gamma: Reward discount factor
         :param minibatch_size: Size of batches used to train the network
+        :param replay_memory: Optional replay buffer the samples are stored in. Defaults to a ReplayBuffer holding the
+                              3000 most recent samples
+        :param seed: Seed of the agent's random number generator
         """
-        super().__init__(env)
+        super().__init__(env, seed)
         self.env = env
         self.q_network = q_network
-        self.replay_memory = deque(maxlen=3000)
+        self.replay_memory = ReplayBuffer(3000, seed=self.rng) if replay_memory is None else replay_memory
         self.policy = self.q_network.derive_policy(EpsilonGreedyPolicy,
                                                    env.valid_actions_from,
-                                                   epsilon=lambda x: 0.05)
+                                                   epsilon=lambda x: 0.05,
+                                                   seed=self.rng)
         self.minibatch_size = minibatch_size
         self.gamma = gamma
 
@@ -37,25 +41,25 @@ class DeepQLearning(Agent):
         :param num_episodes: Number of episodes that should be run
         :return: A policy derived from the trained Q network
         """
-        Q, pi = self.q_network, self.policy
+        pi = self.policy
         for e in range(num_episodes):
             s = self.env.reset()                            # Initialize the environment
             while not s.is_terminal():                      # Repeat until environment is terminal:
                 a = pi.sample(s)                            # - Epsilon-greedily pick an action
                 s_p, r = self.env.step(a)                   # - Perform the action, obtain feedback
                 self.add_to_replay_memory(s, a, r, s_p)     # - Store result as sample to be trained on
-                Q.fit_on_samples(self.sample_minibatch())   # - Train the model on a random batch of samples
+                self.replay()                               # - Train the model on a random batch of samples
                 s = s_p                                     # - Continue to next state
         return pi
 
-    def sample_minibatch(self) -> list:
+    def replay(self):
         """
-        Get a random minibatch of samples from current replay memory
-        :return: A list of samples
+        Train the Q-Network on a minibatch sampled from replay memory, and report the TD errors of the samples back to
+        the replay memory (which a prioritized replay buffer uses to update their priorities)
         """
-        ixs = np.random.choice(range(len(self.replay_memory)),  # Sample random indices to take samples from
-                               size=self.minibatch_size)
-        return [self.replay_memory[i] for i in ixs]             # TODO -- faster by sorting ixs
+        ixs, weights = self.replay_memory.sample_indices(self.minibatch_size)
+        td_errors = self.q_network.fit_on_batch(*self.replay_memory.get(ixs), weights=weights)
+        self.replay_memory.update_priorities(ixs, td_errors)
 
     def add_to_replay_memory(self, s, a, r, sp):
         """
@@ -65,7 +69,8 @@ class DeepQLearning(Agent):
         :param r: Reward obtained from performing the action
         :param sp: Resulting state
         """
-        self.replay_memory.append((s, a, r, sp))
+        Q = self.q_network
+        self.replay_memory.add_states(s, Q.out_index[a], r, sp, Q.phi)
 
 
 if __name__ == '__main__':
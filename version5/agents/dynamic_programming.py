@@ -0,0 +1,143 @@
+import numpy as np
+
+from version5.agent import Agent
+from version5.environments.easy21 import Easy21, Easy21State, CARD_VALUES, DEALER_SUMS, card_distribution, \
+    dealer_distribution
+from version5.policy import Policy, GreedyPolicy
+from version5.q_table import QTable
+
+"""
+    Model-based planning for Easy21. Since the rules of the game are fully known, the transition and reward model can
+    be built exactly from the p_red parameter. Values are stored in arrays of shape (21, 10) where entry [p - 1, d - 1]
+    corresponds to the non-terminal state with player score p and dealer score d
+"""
+
+
+def hit_model(p_red: float) -> tuple:
+    """
+    Build the model of the hit action. Hitting only changes the player score, so the model is independent of the
+    dealer score
+    :param p_red: The probability of drawing a red card
+    :return: A two-tuple of
+                - an array of shape (21, 21) where entry [p - 1, p' - 1] is the probability of moving from player
+                  score p to the valid player score p'
+                - an array of shape (21,) containing the probability of going bust from each player score
+    """
+    p_card = card_distribution(p_red)
+    transitions = np.zeros(shape=(21, 21))
+    bust = np.zeros(shape=21)
+    for p in range(1, 22):
+        for v, prob in zip(CARD_VALUES, p_card):
+            if 1 <= p + v <= 21:
+                transitions[p - 1, p + v - 1] += prob
+            else:
+                bust[p - 1] += prob
+    return transitions, bust
+
+
+def stick_model(p_red: float) -> np.ndarray:
+    """
+    Build the model of the stick action. Sticking always ends the game, so only its expected reward is required
+    :param p_red: The probability of drawing a red card
+    :return: An array of shape (21, 10) containing the expected reward of sticking in each non-terminal state
+    """
+    p_sums = np.arange(1, 22)
+    d_valid = (1 <= DEALER_SUMS) & (DEALER_SUMS <= 21)
+    outcome = np.where(d_valid, np.sign(p_sums[:, None] - DEALER_SUMS[None, :]), 1)  # Reward for each final score
+    return outcome @ dealer_distribution(p_red)[:10].T
+
+
+def evaluate_policy(policy: Policy, env: Easy21, gamma: float = 1.0) -> tuple:
+    """
+    Compute the exact value of a policy in Easy21 by solving the Bellman expectation equations as a linear system
+    :param policy: The policy to be evaluated. Its distribution is queried once for every non-terminal state
+    :param env: The Easy21 environment of which the model should be used
+    :param gamma: Reward discount factor
+    :return: A two-tuple of
+                - an array of shape (21, 10) containing the value of the policy in each non-terminal state
+                - the expected return of the policy from the initial state distribution
+    """
+    transitions, bust = hit_model(env.p_red)
+    q_stick = stick_model(env.p_red)
+    p_hit = np.zeros(shape=(21, 10))
+    for p in range(1, 22):                                          # Get the probability of hitting in each state
+        for d in range(1, 11):
+            p_hit[p - 1, d - 1] = policy.distribution(Easy21State(p, d, False)).get(Easy21.HIT, 0)
+    p_hit = p_hit.flatten()                                         # States are flattened in the order of their index
+
+    a = np.eye(210) - gamma * p_hit[:, None] * np.kron(transitions, np.eye(10))
+    b = -p_hit * np.repeat(bust, 10) + (1 - p_hit) * q_stick.flatten()
+    v = np.linalg.solve(a, b).reshape(21, 10)
+    return v, v[:10].mean()                                         # Initial scores are uniform over 1-10
+
+
+class ValueIteration(Agent):
+    """
+        Value Iteration Agent implementation that computes the optimal Q-values of Easy21 from its exact model
+    """
+
+    def __init__(self, env: Easy21, gamma: float = 1.0, theta: float = 1e-12):
+        """
+        Create a new ValueIteration Agent
+        :param env: The Easy21 environment of which the model should be used
+        :param gamma: Reward discount factor
+        :param theta: The algorithm stops once the values change less than theta in an iteration
+        """
+        super().__init__(env)
+        self.q_table = QTable()
+        self.policy = self.q_table.derive_policy(GreedyPolicy, env.valid_actions_from)
+        self.gamma = gamma
+        self.theta = theta
+
+    def learn(self, num_iter=10000) -> GreedyPolicy:
+        """
+        Compute the optimal Q-values and store them in the Q table
+        :param num_iter: The maximum number of iterations the algorithm should run
+        :return: the greedy policy with respect to the optimal Q-values
+        """
+        transitions, bust = hit_model(self.env.p_red)
+        q_stick = stick_model(self.env.p_red)
+        v = np.zeros(shape=(21, 10))
+        for _ in range(num_iter):
+            q_hit = -bust[:, None] + self.gamma * transitions @ v   # Busting gives -1, otherwise continue playing
+            v_p = np.maximum(q_hit, q_stick)
+            delta = np.max(np.abs(v_p - v))
+            v = v_p
+            if delta < self.theta:
+                break
+        q_hit = -bust[:, None] + self.gamma * transitions @ v
+
+        for p in range(1, 22):                                      # Store the results in the Q table
+            for d in range(1, 11):
+                s = Easy21State(p, d, False)
+                self.q_table[s, Easy21.HIT] = float(q_hit[p - 1, d - 1])
+                self.q_table[s, Easy21.STICK] = float(q_stick[p - 1, d - 1])
+        return self.policy
+
+
+if __name__ == '__main__':
+    import time
+    import matplotlib.pyplot as plt
+
+    _env = Easy21()
+
+    procedure = ValueIteration(_env)
+
+    _t = time.time()
+    q = procedure.learn()
+    print('Solved in {:.3f}s'.format(time.time() - _t))
+
+    table = procedure.q_table
+
+    print(table)
+
+    vs = np.zeros(shape=(21, 10))
+
+    for (state, action), value in table.items():
+        vs[state.p_sum - 1, state.d_sum - 1] = max([table[state, a] for a in _env.valid_actions()])
+
+    print('Expected return of the optimal policy: {:.4f}'.format(vs[:10].mean()))
+    print('Expected return of the derived policy: {:.4f}'.format(evaluate_policy(q, _env)[1]))
+
+    plt.imshow(vs)
+    plt.show()
@@ -0,0 +1,227 @@
+import math
+
+import numpy as np
+
+from version5.agent import Agent
+from version5.core import FiniteActionEnvironment
+from version5.policy import GreedyPolicy
+
+
+class MCTS(Agent):
+    """
+        Monte Carlo Tree Search Agent implementation that plans online using UCT
+
+        The search branches off the current environment state through the environment's get_state/set_state snapshots.
+        Node statistics are stored in flat arrays indexed by node id. Children are found through a single dictionary
+        mapping (node, action index, resulting state) to the child's node id, so stochastic transitions are supported.
+        The subtree below the chosen action is reused for the next decision. The tree is then compacted, so nodes
+        outside of the reused subtree are freed
+    """
+
+    def __init__(self, env: FiniteActionEnvironment, budget: int = 1000, c: float = math.sqrt(2), gamma: float = 1.0,
+                 capacity: int = 2 ** 16, seed=None):
+        """
+        Create a new MCTS Agent
+        :param env: The environment the agent plans in. Must support get_state/set_state
+        :param budget: The number of simulations that are run per decision
+        :param c: The exploration constant used in UCT
+        :param gamma: Reward discount factor
+        :param capacity: The initial number of nodes the arrays can hold. The arrays grow when the tree outgrows them
+        :param seed: Seed of the agent's random number generator
+        """
+        super().__init__(env, seed)
+        assert budget > 0
+        assert capacity > 0
+        self.budget = budget
+        self.c = c
+        self.gamma = gamma
+
+        self.actions = env.action_space()
+        self._action_index = {a: i for i, a in enumerate(self.actions)}
+
+        self.visits = np.zeros(shape=capacity)                               # N(s) per node
+        self.action_visits = np.zeros(shape=(capacity, len(self.actions)))   # N(s, a) per node
+        self.action_returns = np.zeros(shape=(capacity, len(self.actions)))  # Sum of returns after (s, a) per node
+        self.children = dict()
+        self.size = 0
+
+        self.root = None
+        self._previous = None           # (node, action index) of the last decision, used for tree reuse
+        self.returns = []               # Returns obtained in the episodes played while learning
+
+        self.policy = GreedyPolicy()    # Values of the policy are root visit counts after searching
+        self.policy._actions_from = env.valid_actions_from
+        self.policy._actions_values_from = self.search
+
+    def _clear(self):
+        """
+        Remove all nodes from the tree
+        """
+        self.children.clear()
+        self.size = 0
+        self.root = None
+
+    def _compact(self, root: int) -> int:
+        """
+        Keep only the subtree below a node. The nodes of the subtree are moved to the front of the arrays (in breadth-
+        first order) and the children dict is rebuilt, so all other nodes are freed
+        :param root: The node whose subtree should be kept
+        :return: the new id of the node, which is 0
+        """
+        edges = dict()                                              # Maps each node to its (action index, state, child)
+        for (node, a, s), child in self.children.items():
+            edges.setdefault(node, []).append((a, s, child))
+
+        order, new_id, children = [root], {root: 0}, dict()
+        for node in order:                                          # Breadth-first traversal, order grows as we go
+            for a, s, child in edges.get(node, ()):
+                new_id[child] = len(order)
+                order.append(child)
+                children[new_id[node], a, s] = new_id[child]
+
+        order = np.array(order, dtype=np.int64)
+        m = len(order)
+        self.visits[:m] = self.visits[order]
+        self.action_visits[:m] = self.action_visits[order]
+        self.action_returns[:m] = self.action_returns[order]
+        self.children = children
+        self.size = m
+        return 0
+
+    def _new_node(self) -> int:
+        """
+        Add a node to the tree. Grows the arrays if they are full
+        :return: the id of the new node
+        """
+        if self.size == len(self.visits):
+            self.visits = np.concatenate([self.visits, np.zeros_like(self.visits)])
+            self.action_visits = np.concatenate([self.action_visits, np.zeros_like(self.action_visits)])
+            self.action_returns = np.concatenate([self.action_returns, np.zeros_like(self.action_returns)])
+        node = self.size
+        self.visits[node] = 0
+        self.action_visits[node] = 0
+        self.action_returns[node] = 0
+        self.size += 1
+        return node
+
+    def _select(self, node: int, valid: list) -> int:
+        """
+        Select an action index from the node using UCT. Actions that were never tried are selected first
+        :param node: The node from which an action is selected
+        :param valid: A list of indices of the actions that can be performed from the node
+        :return: the selected action index
+        """
+        n_sa = self.action_visits[node, valid]
+        if not n_sa.all():
+            return valid[int(np.argmin(n_sa))]
+        q = self.action_returns[node, valid] / n_sa
+        u = q + self.c * np.sqrt(math.log(self.visits[node]) / n_sa)
+        return valid[int(np.argmax(u))]
+
+    def _valid(self) -> list:
+        """
+        :return: a list of indices of the actions that can be performed on the current environment state
+        """
+        return [self._action_index[a] for a in self.env.valid_actions()]
+
+    def _rollout(self) -> float:
+        """
+        Play uniformly random actions until the episode ends
+        :return: the discounted return obtained during the rollout
+        """
+        g, discount, terminal = 0, 1, False
+        while not terminal:
+            s, r = self.env.step(self.env.sample())
+            g += discount * r
+            discount *= self.gamma
+            terminal = s.is_terminal()
+        return g
+
+    def _simulate(self):
+        """
+        Run a single simulation from the root: select actions down the tree, expand one node, perform a rollout from
+        it and back up the obtained returns
+        """
+        node, path, g = self.root, [], 0
+        while True:
+            a = self._select(node, self._valid())
+            s, r = self.env.step(self.actions[a])
+            path.append((node, a, r))
+            if s.is_terminal():
+                break
+            key = (node, a, s)
+            child = self.children.get(key)
+            if child is None:                                       # Expand the tree and estimate the new node
+                self.children[key] = self._new_node()
+                g = self._rollout()
+                break
+            node = child
+
+        for node, a, r in reversed(path):                           # Back up the returns
+            g = r + self.gamma * g
+            self.visits[node] += 1
+            self.action_visits[node, a] += 1
+            self.action_returns[node, a] += g
+
+    def search(self, state) -> dict:
+        """
+        Search the best action from the given state. The environment should currently be in this state
+        :param state: The current state of the environment
+        :return: a dict mapping all valid actions to their visit count at the root
+        """
+        root = None
+        if self._previous is not None:                              # Reuse the subtree of the observed transition
+            root = self.children.get(self._previous + (state,))
+        if root is not None:
+            root = self._compact(root)
+        else:
+            self._clear()
+            root = self._new_node()
+        self.root = root
+
+        snapshot = self.env.get_state()
+        for _ in range(self.budget):
+            self._simulate()
+            self.env.set_state(snapshot)
+        return {self.actions[a]: self.action_visits[root, a] for a in self._valid()}
+
+    def act(self, state):
+        """
+        Pick an action to perform on the given state. The environment should currently be in this state
+        :param state: The current state of the environment
+        :return: the most visited action at the root after searching
+        """
+        visits = self.search(state)
+        action = max(visits, key=visits.get)
+        self._previous = (self.root, self._action_index[action])
+        return action
+
+    def learn(self, num_iter=1000) -> GreedyPolicy:
+        """
+        Play a number of episodes, planning each decision online
+        :param num_iter: The number of episodes that should be played
+        :return: a policy that searches from the current environment state every time an action is sampled
+        """
+        for _ in range(num_iter):
+            s, g, discount = self.env.reset(), 0, 1
+            self._previous = None
+            while not s.is_terminal():
+                s, r = self.env.step(self.act(s))
+                g += discount * r
+                discount *= self.gamma
+            self.returns.append(g)
+        return self.policy
+
+
+if __name__ == '__main__':
+    import time
+    from version5.environments.easy21 import Easy21
+
+    _env = Easy21()
+
+    procedure = MCTS(_env, budget=1000)
+
+    _t = time.time()
+    q = procedure.learn(num_iter=1000)
+    print('Played 1000 episodes in {:.1f}s'.format(time.time() - _t))
+    print('Average return: {:.3f}'.format(np.mean(procedure.returns)))
@@ -11,18 +11,24 @@ class MonteCarlo(Agent):
         Monte Carlo Agent implementation
     """
 
-    def __init__(self, env: FiniteActionEnvironment, gamma: float = 1.0):
+    def __init__(self, env: FiniteActionEnvironment, gamma: float = 1.0, seed=None, q_table: QTable = None,
+                 visit_count=None):
         """
         Create a new MonteCarlo Agent
         :param env: The environment the agent will learn from
         :param gamma: Reward discount factor
+        :param seed: Seed of the agent's random number generator
+        :param q_table: Optional Q table to learn in. Defaults to an empty QTable
+        :param visit_count: Optional mapping to keep visit counts in. Missing keys should count as 0.
+                            Defaults to an empty defaultdict(int)
         """
-        super().__init__(env)
-        self.q_table = QTable()
-        self.visit_count = defaultdict(int)
+        super().__init__(env, seed)
+        self.q_table = QTable() if q_table is None else q_table
+        self.visit_count = defaultdict(int) if visit_count is None else visit_count
         self.policy = self.q_table.derive_policy(EpsilonGreedyPolicy,
                                                  env.valid_actions_from,
-                                                 epsilon=self.epsilon)
+                                                 epsilon=self.epsilon,
+                                                 seed=self.rng)
         self.gamma = gamma
 
     def learn(self, num_iter=100000) -> EpsilonGreedyPolicy:
@@ -43,8 +49,8 @@ class MonteCarlo(Agent):
             
             for i, (s, a, r) in enumerate(reversed(e)):         # Reverse rewards so G can be computed efficiently
                 g = r if i == 0 else g * self.gamma + r
-                N[s, a] += 1
                 N[s] += 1
+                N[s, a] += 1
                 Q[s, a] += (1 / N[s, a]) * (g - Q[s, a])
         return pi
 
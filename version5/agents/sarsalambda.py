@@ -13,22 +13,29 @@ class SarsaLambda(Agent):
         Sarsa-lambda Agent implementation
     """
 
-    def __init__(self, env: FiniteActionEnvironment, lam: float = 0.2, gamma: float = 1.0):
+    def __init__(self, env: FiniteActionEnvironment, lam: float = 0.2, gamma: float = 1.0, seed=None,
+                 q_table: QTable = None, visit_count=None):
         """
         Create a new SarsaLambda Agent
         :param env: The environment the agent will learn from
         :param lam: The lambda parameter
         :param gamma: Reward discount factor
+        :param seed: Seed of the agent's random number generator
+        :param q_table: Optional Q table to learn in. Defaults to an empty QTable
+        :param visit_count: Optional mapping to keep visit counts in. Missing keys should count as 0.
+                            Defaults to an empty defaultdict(int)
         """
-        super().__init__(env)
+        super().__init__(env, seed)
         assert 0 <= lam <= 1
 
-        self.q_table = QTable()
-        self.visit_count = defaultdict(int)
+        self.q_table = QTable() if q_table is None else q_table
+        self.visit_count = defaultdict(int) if visit_count is None else visit_count
         self.eligibility_trace = defaultdict(int)
+        self.step_size = dict()     # Step size of each (s, a) in the trace, kept even if its visit count is evicted
         self.policy = self.q_table.derive_policy(EpsilonGreedyPolicy,
                                                  env.valid_actions_from,
-                                                 epsilon=self.epsilon)
+                                                 epsilon=self.epsilon,
+                                                 seed=self.rng)
         self.lam = lam
         self.gamma = gamma
 
@@ -38,14 +45,16 @@ class SarsaLambda(Agent):
         :param num_iter: The number of iterations the algorithm should run
         :return: the derived policy
         """
-        N, Q, E, pi = self.visit_count, self.q_table, self.eligibility_trace, self.policy
+        N, Q, E, alpha, pi = self.visit_count, self.q_table, self.eligibility_trace, self.step_size, self.policy
         for _ in range(num_iter):
             E.clear()
+            alpha.clear()
             s = self.env.reset()
             a = self.env.sample()
 
             N[s] += 1
             N[s, a] += 1
+            alpha[s, a] = 1 / N[s, a]
 
             while not s.is_terminal():
                 s_p, r = self.env.step(a)
@@ -55,10 +64,11 @@ class SarsaLambda(Agent):
 
                 E[s, a] += 1
                 N[s_p, a_p] += 1
+                alpha[s_p, a_p] = 1 / N[s_p, a_p]
 
                 delta = r + self.gamma * Q[s_p, a_p] - Q[s, a]
                 for k in E.keys():
-                    Q[k] += (1 / N[k]) * delta * E[k]
+                    Q[k] += alpha[k] * delta * E[k]
                     E[k] *= self.gamma * self.lam
 
                 s, a = s_p, a_p
@@ -74,8 +84,8 @@ class MonteCarlo(SarsaLambda):
         SarsaLambda with lambda=1 is equivalent to MonteCarlo
     """
 
-    def __init__(self, env: FiniteActionEnvironment):
-        super().__init__(env, lam=1)
+    def __init__(self, env: FiniteActionEnvironment, seed=None):
+        super().__init__(env, lam=1, seed=seed)
 
 
 class TD0(SarsaLambda):
@@ -83,8 +93,8 @@ class TD0(SarsaLambda):
         SarsaLambda with lambda=0 is equivalent to TD(0)
     """
 
-    def __init__(self, env: FiniteActionEnvironment):
-        super().__init__(env, lam=0)
+    def __init__(self, env: FiniteActionEnvironment, seed=None):
+        super().__init__(env, lam=0, seed=seed)
 
 
 if __name__ == '__main__':
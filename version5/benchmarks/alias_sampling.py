@@ -0,0 +1,64 @@
+import timeit
+
+import numpy as np
+
+from version5.agents.montecarlo import MonteCarlo
+from version5.environments.easy21 import Easy21, Easy21State
+from version5.policy import Policy
+
+"""
+    Microbenchmark of sampling actions from stochastic policies. Compares Policy.sample (which calls
+    Generator.choice on the distribution every time) to sampling from cached alias tables
+"""
+
+
+class FixedPolicy(Policy):
+    """
+        Policy with the same fixed distribution over a number of actions in every state
+    """
+
+    def __init__(self, num_actions: int, seed=None):
+        super().__init__(seed)
+        self.actions = list(range(num_actions))
+        self.values = {a: v for a, v in zip(self.actions, self.rng.random(num_actions))}
+
+    def _actions_from(self, state) -> list:
+        return self.actions
+
+    def _actions_values_from(self, state) -> dict:
+        return dict(self.values)
+
+
+def compare(policy: Policy, states: list, number: int = 100000):
+    """
+    Print the time per sample of a policy and of its cached counterpart, and the largest difference between the
+    empirical action frequencies of the cached policy and the policy distribution
+    :param policy: The policy to be sampled from
+    :param states: The states at which actions are sampled
+    :param number: The number of samples that are drawn to time each policy
+    """
+    cached = policy.cache_distributions()
+    _t_choice = timeit.timeit(lambda: [policy.sample(s) for s in states], number=number // len(states))
+    _t_alias = timeit.timeit(lambda: [cached.sample(s) for s in states], number=number // len(states))
+    s = states[0]
+    counts = {a: 0 for a in policy.distribution(s)}
+    for _ in range(number):
+        counts[cached.sample(s)] += 1
+    error = max(abs(counts[a] / number - p) for a, p in policy.distribution(s).items())
+    print('{:<24} choice: {:6.3f}us  alias: {:6.3f}us  max frequency error: {:.4f}'.format(
+        '{} actions'.format(len(counts)), 1e6 * _t_choice / number, 1e6 * _t_alias / number, error))
+
+
+if __name__ == '__main__':
+
+    _env = Easy21(seed=0)
+    procedure = MonteCarlo(_env, seed=0)
+    procedure.learn(num_iter=100000)
+    _policy = procedure.q_table.derive_policy(Policy, _env.valid_actions_from, seed=0)
+    compare(_policy, [Easy21State.from_index(i) for i in range(Easy21State.NUM_NONTERMINAL)])
+
+    for _n in [10, 100, 1000]:
+        compare(FixedPolicy(_n, seed=0), [None])
+
+    _t = timeit.timeit(lambda: np.random.choice(100), number=100000)
+    print('Reference: np.random.choice(100) takes {:.3f}us'.format(1e6 * _t / 100000))
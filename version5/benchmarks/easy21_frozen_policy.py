@@ -0,0 +1,33 @@
+import timeit
+
+from version5.agents.montecarlo import MonteCarlo
+from version5.environments.easy21 import Easy21, Easy21State
+from version5.policy import GreedyPolicy
+
+"""
+    Microbenchmark of frozen policies. Compares acting with a greedy policy derived from a learned Q table (one dict of
+    Q-values per call) to acting with the same policy frozen into a lookup table
+"""
+
+
+if __name__ == '__main__':
+
+    _env = Easy21(seed=0)
+    procedure = MonteCarlo(_env, seed=0)
+    procedure.learn(num_iter=100000)
+
+    _live = procedure.q_table.derive_policy(GreedyPolicy, _env.valid_actions_from)
+    _states = [Easy21State.from_index(i) for i in range(Easy21State.NUM_NONTERMINAL)]
+    _frozen = _live.freeze(_states)
+    assert all(_live.sample(s) == _frozen.act(s) for s in _states)
+
+    _t_live = timeit.timeit(lambda: [_live.sample(s) for s in _states], number=1000)
+    _t_frozen = timeit.timeit(lambda: [_frozen.act(s) for s in _states], number=1000)
+    _t_batch = timeit.timeit(lambda: _frozen.act_batch(_states), number=1000)
+    _n = 1000 * len(_states)
+    print('Live greedy policy:    {:.3f}us per action'.format(1e6 * _t_live / _n))
+    print('Frozen policy:         {:.3f}us per action'.format(1e6 * _t_frozen / _n))
+    print('Frozen policy (batch): {:.3f}us per action'.format(1e6 * _t_batch / _n))
+
+    _terminal = Easy21State(25, 5, True)                                # Not frozen, uses the live estimator
+    print(_frozen.act(_terminal) == _live.sample(_terminal), _frozen.act_batch([_states[0], _terminal]))
@@ -0,0 +1,72 @@
+import timeit
+
+from version5.core import State
+from version5.environments.easy21 import Easy21, Easy21State
+
+"""
+    Microbenchmark of the Easy21 state interning. Counts how many state objects are allocated per episode and compares
+    dictionary lookups using canonical states to lookups using freshly allocated (non-interned) states
+"""
+
+
+class PlainEasy21State(State):
+    """
+        Non-interned Easy21 state, allocated anew every time it is created (as Easy21State was before interning)
+    """
+
+    def __init__(self, p_sum: int, d_sum: int, terminal: bool):
+        super().__init__(terminal)
+        self.p_sum, self.d_sum = p_sum, d_sum
+
+    def __eq__(self, other):
+        return isinstance(other, PlainEasy21State) and \
+               self.p_sum == other.p_sum and \
+               self.d_sum == other.d_sum and \
+               self.terminal == other.terminal
+
+    def __hash__(self) -> int:
+        h = 2 if self.terminal else 0
+        h += self.p_sum * 3
+        h += self.d_sum * 5
+        return h
+
+
+def play(env: Easy21, num_episodes: int) -> tuple:
+    """
+    Play a number of random episodes
+    :param env: The environment to play in
+    :param num_episodes: The number of episodes to play
+    :return: A two-tuple of (number of states returned, number of new state objects allocated)
+    """
+    num_allocated = len(Easy21State._instances)
+    num_states = 0
+    for _ in range(num_episodes):
+        s = env.reset()
+        num_states += 1
+        while not s.is_terminal():
+            s, _ = env.step(env.sample())
+            num_states += 1
+    return num_states, len(Easy21State._instances) - num_allocated
+
+
+if __name__ == '__main__':
+
+    _env = Easy21()
+    _episodes = 100000
+
+    play(_env, 10000)                                               # Warm up the state cache
+    _states, _allocated = play(_env, _episodes)
+    print('States returned per episode:     {:.3f}'.format(_states / _episodes))
+    print('States allocated per episode:    {:.6f} (was {:.3f} without interning)'.format(_allocated / _episodes,
+                                                                                           _states / _episodes))
+
+    _keys = [Easy21State(p, d, False) for p in range(1, 22) for d in range(1, 11)]
+    _table = {k: 0 for k in _keys}
+    _plain_table = {PlainEasy21State(k.p_sum, k.d_sum, k.terminal): 0 for k in _keys}
+
+    _t_interned = timeit.timeit(lambda: [_table[Easy21State(k.p_sum, k.d_sum, k.terminal)] for k in _keys],
+                                number=1000)
+    _t_plain = timeit.timeit(lambda: [_plain_table[PlainEasy21State(k.p_sum, k.d_sum, k.terminal)] for k in _keys],
+                             number=1000)
+    print('Create + lookup (interned):      {:.3f}s'.format(_t_interned))
+    print('Create + lookup (not interned):  {:.3f}s'.format(_t_plain))
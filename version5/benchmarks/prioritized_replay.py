@@ -0,0 +1,58 @@
+import time
+
+import numpy as np
+
+from version5.replay_buffer import ReplayBuffer, PrioritizedReplayBuffer
+
+"""
+    Benchmark of sampling from a full replay buffer with a capacity of 1M transitions. Compares uniform sampling to
+    prioritized sampling (including the priority updates that follow every training step)
+"""
+
+
+def fill(buffer: ReplayBuffer, n: int) -> float:
+    """
+    Add transitions with random model inputs to a buffer
+    :param buffer: The buffer to be filled
+    :param n: The number of transitions to add
+    :return: the time it took to add the transitions
+    """
+    xs = buffer.rng.random((n + 1, 4)).astype(np.float32)
+    t = time.time()
+    for i in range(n):
+        buffer.add(xs[i], i % 2, 0.0, xs[i + 1], False)
+    return time.time() - t
+
+
+def benchmark(buffer: ReplayBuffer, batch_size: int, num_batches: int) -> float:
+    """
+    Sample batches from a buffer and report random TD errors back to it
+    :param buffer: The buffer to sample from
+    :param batch_size: The number of transitions in each batch
+    :param num_batches: The number of batches to sample
+    :return: the number of transitions sampled per second
+    """
+    td_errors = buffer.rng.normal(size=(num_batches, batch_size))
+    t = time.time()
+    for k in range(num_batches):
+        ixs, weights = buffer.sample_indices(batch_size)
+        buffer.get(ixs)
+        buffer.update_priorities(ixs, td_errors[k])
+    return batch_size * num_batches / (time.time() - t)
+
+
+if __name__ == '__main__':
+    _capacity = 10 ** 6
+
+    for _buffer in [ReplayBuffer(_capacity, seed=0), PrioritizedReplayBuffer(_capacity, seed=0)]:
+        _name = type(_buffer).__name__
+        print('{:<24} filled in {:.2f}s'.format(_name, fill(_buffer, _capacity)))
+        for _batch_size in [32, 256]:
+            print('{:<24} batch {:>3}: {:>10.0f} transitions/s'.format(
+                _name, _batch_size, benchmark(_buffer, _batch_size, 2000)))
+
+    _buffer = PrioritizedReplayBuffer(1000, alpha=1.0, seed=0)       # Check that sampling follows the priorities
+    fill(_buffer, 1000)
+    _buffer.update_priorities(np.arange(1000), np.arange(1000) - _buffer.epsilon)
+    _counts = np.bincount(np.concatenate([_buffer.sample_indices(100)[0] for _ in range(10000)]), minlength=1000)
+    print('Correlation of sample counts with priorities: {:.4f}'.format(np.corrcoef(_counts, np.arange(1000))[0, 1]))
@@ -0,0 +1,251 @@
+import collections
+import collections.abc
+
+from version5.q_table import QTable
+
+"""
+    Capacity-bounded stores that evict entries once they are full, and a Q Table built on top of them. The stores keep
+    track of hits, misses and evictions so their capacity can be sized deliberately
+"""
+
+
+class EvictingStore(collections.abc.MutableMapping):
+    """
+        Mapping with a maximum number of entries. Adding an entry to a full store evicts another entry, as decided by
+        the eviction policy of the subclass
+    """
+
+    def __init__(self, capacity: int, default_factory: callable = None):
+        """
+        Create a new EvictingStore
+        :param capacity: The maximum number of entries in the store
+        :param default_factory: Optional function that gives a default value for missing keys (like defaultdict).
+                                The default value is only stored once it is assigned
+        """
+        assert capacity > 0
+        self.capacity = capacity
+        self.default_factory = default_factory
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def _missing(self, key):
+        """
+        Handle a lookup of a key that is not in the store
+        :param key: The key that was looked up
+        :return: the default value for the key, if a default factory was specified
+        """
+        self.misses += 1
+        if self.default_factory is None:
+            raise KeyError(key)
+        return self.default_factory()
+
+    def stats(self) -> dict:
+        """
+        :return: a dict containing the number of hits, misses and evictions
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+class LRUStore(EvictingStore):
+    """
+        EvictingStore that evicts the least recently used entry
+    """
+
+    def __init__(self, capacity: int, default_factory: callable = None):
+        super().__init__(capacity, default_factory)
+        self._data = collections.OrderedDict()  # Ordered from least to most recently used
+
+    def __getitem__(self, key):
+        try:
+            value = self._data[key]
+        except KeyError:
+            return self._missing(key)
+        self.hits += 1
+        self._data.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self._data:
+            self._data.move_to_end(key)
+        elif len(self._data) >= self.capacity:
+            self._data.popitem(last=False)
+            self.evictions += 1
+        self._data[key] = value
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def items(self):
+        return self._data.items()               # Iterating does not count as using the entries
+
+    def values(self):
+        return self._data.values()
+
+
+class LFUStore(EvictingStore):
+    """
+        EvictingStore that evicts the least frequently used entry. Ties are broken by evicting the entry that reached
+        its frequency first. All operations take constant time
+    """
+
+    def __init__(self, capacity: int, default_factory: callable = None):
+        super().__init__(capacity, default_factory)
+        self._data = dict()
+        self._frequency = dict()                # Maps each key to its number of uses
+        self._buckets = dict()                  # Maps each frequency to the keys with that frequency (in order)
+        self._min_frequency = 0
+
+    def _use(self, key):
+        """
+        Increase the frequency of a key
+        :param key: The key that was used
+        """
+        f = self._frequency[key]
+        bucket = self._buckets[f]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[f]
+            if self._min_frequency == f:
+                self._min_frequency = f + 1
+        self._frequency[key] = f + 1
+        self._buckets.setdefault(f + 1, collections.OrderedDict())[key] = None
+
+    def _evict(self):
+        """
+        Remove the least frequently used entry
+        """
+        bucket = self._buckets[self._min_frequency]
+        key, _ = bucket.popitem(last=False)
+        if not bucket:
+            del self._buckets[self._min_frequency]
+        del self._data[key], self._frequency[key]
+        self.evictions += 1
+
+    def __getitem__(self, key):
+        try:
+            value = self._data[key]
+        except KeyError:
+            return self._missing(key)
+        self.hits += 1
+        self._use(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self._data:
+            self._use(key)
+        else:
+            if len(self._data) >= self.capacity:
+                self._evict()
+            self._frequency[key] = 1
+            self._buckets.setdefault(1, collections.OrderedDict())[key] = None
+            self._min_frequency = 1
+        self._data[key] = value
+
+    def __delitem__(self, key):
+        del self._data[key]
+        f = self._frequency.pop(key)
+        bucket = self._buckets[f]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[f]
+            if self._min_frequency == f:
+                self._min_frequency = min(self._buckets, default=0)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def items(self):
+        return self._data.items()               # Iterating does not count as using the entries
+
+    def values(self):
+        return self._data.values()
+
+
+STORES = {'lru': LRUStore, 'lfu': LFUStore}
+
+
+def bounded_store(capacity: int, policy: str = 'lru', default_factory: callable = None) -> EvictingStore:
+    """
+    Create a capacity-bounded store. Can for example replace the defaultdict(int) visit counts of the agents
+    :param capacity: The maximum number of entries in the store
+    :param policy: The eviction policy. Either 'lru' (least recently used) or 'lfu' (least frequently used)
+    :param default_factory: Optional function that gives a default value for missing keys
+    :return: the store
+    """
+    if policy not in STORES:
+        raise Exception('Unknown eviction policy: {}'.format(policy))
+    return STORES[policy](capacity, default_factory)
+
+
+class BoundedQTable(QTable):
+    """
+        Q Table implementation that holds a bounded number of states. Once the table is full, adding a new state evicts
+        another state (with all its Q-values) according to the eviction policy
+    """
+
+    def __init__(self, capacity: int, policy: str = 'lru', *args, **kwargs):
+        """
+        Create a new Bounded Q Table
+        :param capacity: The maximum number of states in the table
+        :param policy: The eviction policy. Either 'lru' (least recently used) or 'lfu' (least frequently used)
+        """
+        self.store = bounded_store(capacity, policy)
+        self.update(dict(*args, **kwargs))
+
+    @property
+    def hits(self) -> int:
+        """
+        :return: The number of lookups of states that were in the table
+        """
+        return self.store.hits
+
+    @property
+    def misses(self) -> int:
+        """
+        :return: The number of lookups of states that were not in the table
+        """
+        return self.store.misses
+
+    @property
+    def evictions(self) -> int:
+        """
+        :return: The number of states that were evicted from the table
+        """
+        return self.store.evictions
+
+    def stats(self) -> dict:
+        """
+        :return: a dict containing the number of hits, misses and evictions
+        """
+        return self.store.stats()
+
+
+if __name__ == '__main__':
+    from version5.agents.montecarlo import MonteCarlo
+    from version5.agents.sarsalambda import SarsaLambda
+    from version5.environments.easy21 import Easy21
+
+    _env = Easy21()
+
+    for _agent in [MonteCarlo, SarsaLambda]:
+        for _capacity in [10, 50, 100, 210]:
+            for _policy in STORES:
+                procedure = _agent(_env,
+                                   q_table=BoundedQTable(_capacity, _policy),
+                                   visit_count=bounded_store(_capacity, _policy, default_factory=int))
+                procedure.learn(num_iter=10000)
+                print(_agent.__name__, _capacity, _policy, len(procedure.q_table), procedure.q_table.stats())
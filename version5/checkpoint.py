@@ -0,0 +1,182 @@
+import os
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+from version5.core import _index
+from version5.q_table import QTable, DenseQTable
+
+"""
+    Checkpointing of Q tables and visit counts in a compact columnar binary format
+
+    A checkpoint file consists of a 16 byte header (magic, format version and number of rows) followed by three
+    columns: state indices (int64), action indices (int64, -1 for entries that only have a state) and values (float64).
+    Columns can be loaded without copying through a memory map. Files are written to a temporary file first and then
+    moved into place, so a checkpoint is never left half-written
+"""
+
+MAGIC = b'QCKP'
+VERSION = 1
+HEADER = np.dtype([('magic', 'S4'), ('version', '<u4'), ('rows', '<u8')])
+
+
+def _write(path: str, states: np.ndarray, actions: np.ndarray, values: np.ndarray):
+    """
+    Atomically write columns to a checkpoint file
+    :param path: Path of the checkpoint file
+    :param states: Column of state indices
+    :param actions: Column of action indices
+    :param values: Column of values
+    """
+    header = np.array([(MAGIC, VERSION, len(states))], dtype=HEADER)
+    tmp = '{}.{}.tmp'.format(path, threading.get_ident())
+    with open(tmp, 'wb') as f:
+        f.write(header.tobytes())
+        f.write(np.ascontiguousarray(states, dtype='<i8').tobytes())
+        f.write(np.ascontiguousarray(actions, dtype='<i8').tobytes())
+        f.write(np.ascontiguousarray(values, dtype='<f8').tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)                               # Atomically replace the previous checkpoint
+
+
+def _save(path: str, columns: tuple, background: bool):
+    """
+    Write columns to a checkpoint file, optionally in a background thread
+    :param path: Path of the checkpoint file
+    :param columns: A three-tuple of (state indices, action indices, values) columns owned by this call
+    :param background: If set to true, the file is written in a background thread
+    :return: the thread writing the file if background is set, None otherwise
+    """
+    if not background:
+        _write(path, *columns)
+        return None
+    thread = threading.Thread(target=_write, args=(path,) + columns)
+    thread.start()
+    return thread
+
+
+def load_columns(path: str) -> tuple:
+    """
+    Load the columns of a checkpoint file without copying them into memory
+    :param path: Path of the checkpoint file
+    :return: A three-tuple of read-only memory-mapped arrays (state indices, action indices, values)
+    """
+    header = np.fromfile(path, dtype=HEADER, count=1)
+    if len(header) == 0 or header['magic'][0] != MAGIC or header['version'][0] != VERSION:
+        raise Exception('{} is not a checkpoint file!'.format(path))
+    n = int(header['rows'][0])
+    if n == 0:
+        return np.zeros(0, dtype='<i8'), np.zeros(0, dtype='<i8'), np.zeros(0, dtype='<f8')
+    offset = HEADER.itemsize
+    states = np.memmap(path, dtype='<i8', mode='r', offset=offset, shape=(n,))
+    actions = np.memmap(path, dtype='<i8', mode='r', offset=offset + 8 * n, shape=(n,))
+    values = np.memmap(path, dtype='<f8', mode='r', offset=offset + 16 * n, shape=(n,))
+    return states, actions, values
+
+
+def save_table(table: QTable, path: str, state_index: callable = _index, action_index: callable = _index,
+               background: bool = False):
+    """
+    Save a Q table to a checkpoint file
+    :param table: The Q table to be saved
+    :param path: Path of the checkpoint file
+    :param state_index: Function that maps a state to its index. Defaults to state.index()
+    :param action_index: Function that maps an action to its index. Defaults to action.index()
+    :param background: If set to true, the file is written in a background thread. The table is copied before this
+                       function returns, so learning can continue immediately
+    :return: the thread writing the file if background is set, None otherwise
+    """
+    if isinstance(table, DenseQTable):                              # Dense tables are exported without iterating
+        states, actions = np.nonzero(table.stored)
+        values = table.table[states, actions]
+    else:
+        n = len(table)
+        states, actions, values = np.empty(n, dtype=np.int64), np.empty(n, dtype=np.int64), np.empty(n)
+        for i, ((s, a), v) in enumerate(table.items()):
+            states[i], actions[i], values[i] = state_index(s), action_index(a), v
+    return _save(path, (states, actions, values), background)
+
+
+def load_table(path: str, state_from_index: callable, action_from_index: callable, table: QTable = None) -> QTable:
+    """
+    Load a Q table from a checkpoint file
+    :param path: Path of the checkpoint file
+    :param state_from_index: Function that maps a state index to its state
+    :param action_from_index: Function that maps an action index to its action
+    :param table: Optional Q table the entries should be loaded into. Defaults to a new QTable
+    :return: the Q table containing the loaded entries
+    """
+    states, actions, values = load_columns(path)
+    table = QTable() if table is None else table
+    if isinstance(table, DenseQTable):                              # Dense tables are filled without iterating
+        table.table[states, actions] = values
+        table.stored[states, actions] = True
+        return table
+    for s, a, v in zip(states.tolist(), actions.tolist(), values.tolist()):
+        table[state_from_index(s), action_from_index(a)] = v
+    return table
+
+
+def save_counts(counts, path: str, state_index: callable = _index, action_index: callable = _index,
+                background: bool = False):
+    """
+    Save visit counts to a checkpoint file. The counts may be keyed by states as well as by (state, action) pairs
+    :param counts: The mapping containing the visit counts
+    :param path: Path of the checkpoint file
+    :param state_index: Function that maps a state to its index. Defaults to state.index()
+    :param action_index: Function that maps an action to its index. Defaults to action.index()
+    :param background: If set to true, the file is written in a background thread. The counts are copied before this
+                       function returns, so learning can continue immediately
+    :return: the thread writing the file if background is set, None otherwise
+    """
+    n = len(counts)
+    states, actions, values = np.empty(n, dtype=np.int64), np.empty(n, dtype=np.int64), np.empty(n)
+    for i, (k, v) in enumerate(counts.items()):
+        if isinstance(k, tuple):
+            s, a = k
+            states[i], actions[i] = state_index(s), action_index(a)
+        else:
+            states[i], actions[i] = state_index(k), -1
+        values[i] = v
+    return _save(path, (states, actions, values), background)
+
+
+def load_counts(path: str, state_from_index: callable, action_from_index: callable, counts=None):
+    """
+    Load visit counts from a checkpoint file
+    :param path: Path of the checkpoint file
+    :param state_from_index: Function that maps a state index to its state
+    :param action_from_index: Function that maps an action index to its action
+    :param counts: Optional mapping the counts should be loaded into. Defaults to a new defaultdict(int)
+    :return: the mapping containing the loaded counts
+    """
+    counts = defaultdict(int) if counts is None else counts
+    for s, a, v in zip(*(column.tolist() for column in load_columns(path))):
+        key = state_from_index(s) if a < 0 else (state_from_index(s), action_from_index(a))
+        counts[key] = int(v)
+    return counts
+
+
+if __name__ == '__main__':
+    import tempfile
+    import time
+    from version5.agents.montecarlo import MonteCarlo
+    from version5.environments.easy21 import Easy21, Easy21State, Easy21Action
+
+    _env = Easy21()
+    procedure = MonteCarlo(_env)
+    procedure.learn(num_iter=100000)
+
+    _dir = tempfile.mkdtemp()
+    _t = time.time()
+    _threads = [save_table(procedure.q_table, os.path.join(_dir, 'q.ckpt'), background=True),
+                save_counts(procedure.visit_count, os.path.join(_dir, 'n.ckpt'), background=True)]
+    print('Checkpoint taken in {:.4f}s'.format(time.time() - _t))
+    for _thread in _threads:
+        _thread.join()
+
+    _q = load_table(os.path.join(_dir, 'q.ckpt'), Easy21State.from_index, Easy21Action.from_index)
+    _n = load_counts(os.path.join(_dir, 'n.ckpt'), Easy21State.from_index, Easy21Action.from_index)
+    print(dict(_q) == dict(procedure.q_table), dict(_n) == dict(procedure.visit_count))
@@ -1,4 +1,4 @@
-import random
+import numpy as np
 
 """
     Core classes of a Reinforcement Learning experiment
@@ -7,17 +7,40 @@ import random
 """
 
 
+def spawn_seeds(seed, n: int) -> list:
+    """
+    Spawn independent seeds for a number of workers. Random number generators created from the spawned seeds produce
+    non-overlapping streams, so parallel runs are statistically independent and exactly repeatable
+    :param seed: The root seed. Can be an int, a SeedSequence or None (for a random root seed)
+    :param n: The number of seeds to spawn
+    :return: a list of n SeedSequences that can be passed as seed to environments, policies and agents
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return seed.spawn(n)
+
+
+def _index(x) -> int:
+    """
+    Default index function for states and actions that are enumerable
+    :param x: The state or action
+    :return: The dense index of the state or action
+    """
+    return x.index()
+
+
 class Action:
     """
         Action to be performed on an environment
     """
-    pass
+    __slots__ = ()
 
 
 class State:
     """
         Environment state obtained from executing an action in the environment
     """
+    __slots__ = ('terminal',)
 
     def __init__(self, terminal: bool):
         """
@@ -63,12 +86,35 @@ class Environment:
         """
         raise NotImplementedError
 
+    def get_state(self):
+        """
+        Take a snapshot of the internal model state, so the environment can later be restored to it (for example to
+        branch off multiple rollouts from the same state). The random number generator is not part of the snapshot
+        :return: an object describing the internal model state
+        """
+        raise NotImplementedError
+
+    def set_state(self, state):
+        """
+        Restore the internal model state to a snapshot
+        :param state: A snapshot obtained from get_state
+        """
+        raise NotImplementedError
+
 
 class FiniteActionEnvironment(Environment):
     """
         Class of environments that have a finite set of actions
     """
 
+    def __init__(self, seed=None):
+        """
+        Create a new FiniteActionEnvironment
+        :param seed: Seed of the environment's random number generator. Can be an int, a SeedSequence (see
+                     spawn_seeds) or a numpy Generator. If left unspecified, the generator is seeded randomly
+        """
+        self.rng = np.random.default_rng(seed)
+
     @staticmethod
     def valid_actions_from(state) -> list:
         """
@@ -98,7 +144,7 @@ class FiniteActionEnvironment(Environment):
         :return: the sampled action
         """
         actions = self.valid_actions()
-        return actions[random.randint(0, len(actions) - 1)]
+        return actions[self.rng.integers(len(actions))]
 
     def step(self, action: Action) -> tuple:
         raise NotImplementedError
@@ -1,4 +1,5 @@
 import gym
+import numpy as np
 
 from version5.core import State, Action, FiniteActionEnvironment
 
@@ -47,13 +48,15 @@ class CartPole(FiniteActionEnvironment):
     RIGHT = CartPoleAction(True)
     ACTIONS = [LEFT, RIGHT]
 
-    def __init__(self, render=True):
+    def __init__(self, render=True, seed=None):
         """
         Create a new CartPole Environment
         :param render: A boolean indicating whether the environment should be rendered
+        :param seed: Seed of the environment's random number generator
         """
-        super().__init__()
+        super().__init__(seed)
         self.env = gym.make('CartPole-v1')
+        self.env.seed(int(self.rng.integers(2 ** 31)))
         self.render = render
 
         self.terminal = False
@@ -92,6 +95,22 @@ class CartPole(FiniteActionEnvironment):
         self.terminal = False
         return CartPoleState(self.env.reset(), self.terminal)
 
+    def get_state(self) -> tuple:
+        """
+        :return: a four-tuple of (physical state, steps beyond done, elapsed steps, terminal indication)
+        """
+        env = self.env.unwrapped
+        return np.array(env.state), env.steps_beyond_done, self.env._elapsed_steps, self.terminal
+
+    def set_state(self, state: tuple):
+        """
+        Restore the environment state
+        :param state: A four-tuple of (physical state, steps beyond done, elapsed steps, terminal indication)
+        """
+        env = self.env.unwrapped
+        physical_state, env.steps_beyond_done, self.env._elapsed_steps, self.terminal = state
+        env.state = np.array(physical_state)
+
 
 if __name__ == '__main__':
 
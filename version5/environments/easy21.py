@@ -1,4 +1,7 @@
-import random
+import bisect
+import functools
+
+import numpy as np
 
 from version5.core import State, Action, FiniteActionEnvironment
 
@@ -8,21 +11,156 @@ from version5.core import State, Action, FiniteActionEnvironment
     
 '''
 
+CARD_VALUES = np.arange(-10, 11)    # All effects a card can have on a score (red cards subtract their value)
+DEALER_SUMS = np.arange(-9, 27)     # All dealer scores that can occur at the end of a game
+
+
+@functools.lru_cache(maxsize=None)
+def card_distribution(p_red: float) -> np.ndarray:
+    """
+    Get the probability distribution over card effects when drawing a card from the pile
+    :param p_red: The probability of drawing a red card
+    :return: An array containing the probability of each effect in CARD_VALUES
+    """
+    p = np.where(CARD_VALUES < 0, p_red / 10, (1 - p_red) / 10)
+    p[CARD_VALUES == 0] = 0
+    p.setflags(write=False)
+    return p
+
+
+@functools.lru_cache(maxsize=None)
+def dealer_distribution(p_red: float) -> np.ndarray:
+    """
+    Get the probability distribution over the final dealer scores when the dealer plays after the player sticks.
+    The dealer keeps drawing cards while its score is valid and below 17, which is an absorbing Markov chain over the
+    scores 1-16. The distribution is computed exactly by solving this chain and is cached for each value of p_red
+    :param p_red: The probability of drawing a red card
+    :return: An array of shape (21, len(DEALER_SUMS)) where entry [d - 1, i] is the probability that the dealer ends
+             with score DEALER_SUMS[i] when starting from score d
+    """
+    p_card = card_distribution(p_red)
+    drawing = np.arange(1, 17)                                      # Scores from which the dealer keeps drawing
+    q = np.zeros(shape=(len(drawing), len(drawing)))                # Transitions between drawing scores
+    r = np.zeros(shape=(len(drawing), len(DEALER_SUMS)))            # Transitions to final scores
+    for i, d in enumerate(drawing):
+        for v, p in zip(CARD_VALUES, p_card):
+            d_p = d + v
+            if 1 <= d_p <= 16:
+                q[i, d_p - 1] += p
+            else:
+                r[i, d_p - DEALER_SUMS[0]] += p
+    final = np.linalg.solve(np.eye(len(drawing)) - q, r)           # Absorption probabilities of the chain
+
+    dist = np.zeros(shape=(21, len(DEALER_SUMS)))
+    dist[:len(drawing)] = final
+    for d in range(17, 22):                                         # The dealer sticks immediately from 17 and up
+        dist[d - 1, d - DEALER_SUMS[0]] = 1
+    dist.setflags(write=False)
+    return dist
+
+
+@functools.lru_cache(maxsize=None)
+def _dealer_cdf(p_red: float) -> list:
+    """
+    Get the cumulative distributions of the final dealer scores, suitable for sampling with bisect
+    :param p_red: The probability of drawing a red card
+    :return: A list containing for each starting score d (at index d - 1) a list of cumulative probabilities
+             over DEALER_SUMS
+    """
+    cdf = np.cumsum(dealer_distribution(p_red), axis=1)
+    return (cdf / cdf[:, -1:]).tolist()                             # Normalize so the final entries are exactly 1
+
 
 class Easy21State(State):
     """
         Easy21 Environment State
+
+        States are interned: creating a state returns the canonical, immutable instance corresponding to its scores,
+        so equal states are also identical objects
+
+        Every state has a dense index in [0, NUM_STATES). The non-terminal states come first, ordered by player score
+        and then dealer score. Terminal states follow, covering all scores that can occur at the end of a game
     """
+    __slots__ = ('p_sum', 'd_sum', '_index')
+
+    NUM_NONTERMINAL = 21 * 10                                   # Player scores 1-21, dealer scores 1-10
+    TERMINAL_P_SUMS = range(-9, 32)                             # Player scores after the final card
+    TERMINAL_D_SUMS = range(int(DEALER_SUMS[0]), int(DEALER_SUMS[-1]) + 1)  # Dealer scores after the final card
+    NUM_STATES = NUM_NONTERMINAL + len(TERMINAL_P_SUMS) * len(TERMINAL_D_SUMS)
+
+    _instances = dict()     # Maps (p_sum, d_sum, terminal) to the canonical state instance
+
+    def __new__(cls, p_sum: int, d_sum: int, terminal: bool):
+        """
+        Get the canonical Easy21 state
+        :param p_sum: The player score
+        :param d_sum: The dealer score
+        :param terminal: A boolean indicating whether the game is over
+        """
+        key = (p_sum, d_sum, terminal)
+        state = cls._instances.get(key)
+        if state is None:                                   # Create the state the first time it occurs
+            state = super().__new__(cls)
+            p_sum, d_sum, terminal = int(p_sum), int(d_sum), bool(terminal)
+            object.__setattr__(state, 'terminal', terminal)
+            object.__setattr__(state, 'p_sum', p_sum)
+            object.__setattr__(state, 'd_sum', d_sum)
+            object.__setattr__(state, '_index', cls._compute_index(p_sum, d_sum, terminal))
+            cls._instances[key] = state
+        return state
+
+    @classmethod
+    def _compute_index(cls, p_sum: int, d_sum: int, terminal: bool) -> int:
+        """
+        Compute the dense index of a state
+        :param p_sum: The player score
+        :param d_sum: The dealer score
+        :param terminal: A boolean indicating whether the game is over
+        :return: The index of the state
+        """
+        if not terminal:
+            if not (1 <= p_sum <= 21 and 1 <= d_sum <= 10):
+                raise ValueError('Invalid non-terminal Easy21 state (P: {}, D: {})'.format(p_sum, d_sum))
+            return (p_sum - 1) * 10 + (d_sum - 1)
+        p_range, d_range = cls.TERMINAL_P_SUMS, cls.TERMINAL_D_SUMS
+        if p_sum not in p_range or d_sum not in d_range:
+            raise ValueError('Invalid terminal Easy21 state (P: {}, D: {})'.format(p_sum, d_sum))
+        return cls.NUM_NONTERMINAL + (p_sum - p_range[0]) * len(d_range) + (d_sum - d_range[0])
+
+    @classmethod
+    def from_index(cls, index: int) -> 'Easy21State':
+        """
+        Get the state corresponding to a dense index
+        :param index: The index of the state
+        :return: The canonical state with that index
+        """
+        if not 0 <= index < cls.NUM_STATES:
+            raise ValueError('Invalid Easy21 state index {}'.format(index))
+        if index < cls.NUM_NONTERMINAL:
+            return cls(index // 10 + 1, index % 10 + 1, False)
+        p, d = divmod(index - cls.NUM_NONTERMINAL, len(cls.TERMINAL_D_SUMS))
+        return cls(cls.TERMINAL_P_SUMS[p], cls.TERMINAL_D_SUMS[d], True)
+
+    def index(self) -> int:
+        """
+        :return: The dense index of this state
+        """
+        return self._index
 
     def __init__(self, p_sum: int, d_sum: int, terminal: bool):
         """
-        Create a new Easy21 state
+        Create a new Easy21 state. All attributes are set when the canonical instance is created
         :param p_sum: The player score
         :param d_sum: The dealer score
         :param terminal: A boolean indicating whether the game is over
         """
-        super().__init__(terminal)
-        self.p_sum, self.d_sum = p_sum, d_sum
+        pass
+
+    def __setattr__(self, key, value):
+        raise AttributeError('Easy21State is immutable!')
+
+    def __reduce__(self):
+        return Easy21State, (self.p_sum, self.d_sum, self.terminal)
 
     def __str__(self):
         """
@@ -36,6 +174,8 @@ class Easy21State(State):
         :param other: Object to compare this state with
         :return: Whether the specified object is equal to this state
         """
+        if self is other:
+            return True
         if not isinstance(other, Easy21State):
             return False
         else:
@@ -47,23 +187,65 @@ class Easy21State(State):
         """
         :return: A unique hash corresponding to this state
         """
-        h = 2 if self.terminal else 0
-        h += self.p_sum * 3
-        h += self.d_sum * 5
-        return h
+        return self._index
 
 
 class Easy21Action(Action):
     """
         Easy21 Action that can be performed on the environment state
+
+        Actions are interned: there is exactly one immutable instance for hitting and one for sticking
+
+        Every action has a dense index in [0, NUM_ACTIONS), following the order of Easy21.ACTIONS
     """
+    __slots__ = ('hit',)
+
+    NUM_ACTIONS = 2
+
+    _instances = dict()     # Maps hit to the canonical action instance
+
+    def __new__(cls, hit: bool):
+        """
+        Get the canonical Easy21 action
+        :param hit: A boolean indicating whether the player hits
+        """
+        hit = bool(hit)
+        action = cls._instances.get(hit)
+        if action is None:
+            action = super().__new__(cls)
+            object.__setattr__(action, 'hit', hit)
+            cls._instances[hit] = action
+        return action
+
+    @classmethod
+    def from_index(cls, index: int) -> 'Easy21Action':
+        """
+        Get the action corresponding to a dense index
+        :param index: The index of the action
+        :return: The canonical action with that index
+        """
+        if not 0 <= index < cls.NUM_ACTIONS:
+            raise ValueError('Invalid Easy21 action index {}'.format(index))
+        return cls(index == 0)
+
+    def index(self) -> int:
+        """
+        :return: The dense index of this action (0 for hit, 1 for stick)
+        """
+        return 0 if self.hit else 1
 
     def __init__(self, hit: bool):
         """
-        Create a new Easy21 action
+        Create a new Easy21 action. All attributes are set when the canonical instance is created
         :param hit: A boolean indicating whether the player hits
         """
-        self.hit = hit
+        pass
+
+    def __setattr__(self, key, value):
+        raise AttributeError('Easy21Action is immutable!')
+
+    def __reduce__(self):
+        return Easy21Action, (self.hit,)
 
     def __str__(self):
         return 'hit' if self.hit else 'stick'
@@ -72,10 +254,10 @@ class Easy21Action(Action):
         return str(self)
 
     def __eq__(self, other):
-        return isinstance(other, Easy21Action) and self.hit is other.hit
+        return self is other or isinstance(other, Easy21Action) and self.hit is other.hit
 
     def __hash__(self):
-        return 1 if self.hit is 'hit' else 0
+        return self.index()
 
 
 class Easy21(FiniteActionEnvironment):
@@ -87,14 +269,26 @@ class Easy21(FiniteActionEnvironment):
     STICK = Easy21Action(False)
     ACTIONS = [HIT, STICK]
 
-    def __init__(self, p_red: float = 1 / 3):
+    def __init__(self, p_red: float = 1 / 3, buffer_size: int = 65536, seed=None, fast_dealer: bool = False):
         """
         Create a new Easy21 environment
         :param p_red: The probability of drawing a red card
+        :param buffer_size: The number of cards that are drawn in advance each time the card buffer runs out
+        :param seed: Seed of the random number generator used to draw cards and sample actions. The card stream is
+                     reproducible for a given seed and buffer size
+        :param fast_dealer: If set to true, the final dealer score is sampled in one draw from its exact distribution
+                            (see dealer_distribution) instead of letting the dealer draw cards one by one
         """
-        super().__init__()
+        super().__init__(seed)
         assert 0 <= p_red <= 1
+        assert buffer_size > 0
         self.p_red = p_red
+        self.fast_dealer = fast_dealer
+        self._uniforms, self._uniform_index = [], buffer_size
+
+        self.buffer_size = buffer_size
+        self._card_values, self._card_colors, self._card_index = [], [], 0
+        self._fill_card_buffer()
 
         self.p_sum, self.d_sum, self.terminal = self._draw_init_state()
 
@@ -117,12 +311,13 @@ class Easy21(FiniteActionEnvironment):
         """
         return self.p_sum, self.d_sum, self.terminal
 
-    @staticmethod
-    def _draw_card_value() -> int:
+    def _fill_card_buffer(self):
         """
-        :return: A random card value
+        Draw a new batch of random card values (uniform over 1-10) and colors (black with p=1-p_red)
         """
-        return random.randint(1, 10)
+        self._card_values = self.rng.integers(1, 11, size=self.buffer_size).tolist()
+        self._card_colors = (self.rng.random(size=self.buffer_size) > self.p_red).tolist()
+        self._card_index = 0
 
     @staticmethod
     def _card_value(card: tuple) -> int:
@@ -143,21 +338,32 @@ class Easy21(FiniteActionEnvironment):
         """
         return 1 <= score <= 21
 
-    def _draw_card_color(self) -> bool:
-        """
-        :return: A boolean specifying whether the color is black (with p(True)=p_red)
-        """
-        return random.random() > self.p_red
-
     def _draw_card(self, force_black: bool = False) -> tuple:
         """
         Draw a random card from the pile
         :param force_black: If set to true, the card drawn will always be black
         :return: The drawn card
         """
+        if self._card_index == self.buffer_size:                # Refill the buffer once all cards have been drawn
+            self._fill_card_buffer()
+        i = self._card_index
+        self._card_index += 1
         if force_black:
-            return self._draw_card_value(), True
-        return self._draw_card_value(), self._draw_card_color()
+            return self._card_values[i], True
+        return self._card_values[i], self._card_colors[i]
+
+    def _sample_dealer_sum(self, d_sum: int) -> int:
+        """
+        Sample the score the dealer ends with when it starts playing from the given score
+        :param d_sum: The dealer score before the dealer starts drawing cards
+        :return: The final dealer score
+        """
+        if self._uniform_index == self.buffer_size:             # Draw uniform numbers in advance, like the cards
+            self._uniforms = self.rng.random(size=self.buffer_size).tolist()
+            self._uniform_index = 0
+        u = self._uniforms[self._uniform_index]
+        self._uniform_index += 1
+        return int(DEALER_SUMS[0]) + bisect.bisect_right(_dealer_cdf(self.p_red)[d_sum - 1], u)
 
     def _draw_init_state(self) -> tuple:
         """
@@ -198,6 +404,9 @@ class Easy21(FiniteActionEnvironment):
         if action.hit:                                                          # Case 1: Hit action
             self.p_sum += self._card_value(self._draw_card())                   # - Draw a card for the player
             self.terminal = not self._valid_score(self.p_sum)                   # - Check if score is still valid
+        elif self.fast_dealer:                                                  # Case 2: Stick action -> play dealer
+            self.d_sum = self._sample_dealer_sum(self.d_sum)                    # - Sample the final dealer sum
+            self.terminal = True                                                # - End game
         else:                                                                   # Case 2: Stick action -> play dealer
             while self._valid_score(self.d_sum) and self.d_sum < 17:            # - While dealer sum is below 17
                 self.d_sum += self._card_value(self._draw_card())               # - Keep drawing cards
@@ -215,6 +424,155 @@ class Easy21(FiniteActionEnvironment):
     def valid_actions(self) -> list:
         return Easy21.action_space()
 
+    def get_state(self) -> tuple:
+        """
+        :return: a three-tuple of (player score, dealer score, terminal indication)
+        """
+        return self.state
+
+    def set_state(self, state: tuple):
+        """
+        Restore the environment state
+        :param state: A three-tuple of (player score, dealer score, terminal indication)
+        """
+        self.p_sum, self.d_sum, self.terminal = state
+
+
+class Easy21Batch:
+    """
+        Easy21 Environment that plays a batch of games simultaneously
+
+        The games are stored in NumPy arrays so that all cards of a single step can be drawn in one batched call.
+        Finished games are automatically reset at the end of each step
+    """
+
+    def __init__(self, n: int, p_red: float = 1 / 3, seed=None):
+        """
+        Create a new batch of Easy21 games
+        :param n: The number of games that are played simultaneously
+        :param p_red: The probability of drawing a red card
+        :param seed: Seed of the random number generator used to draw cards
+        """
+        assert n > 0
+        assert 0 <= p_red <= 1
+        self.n = n
+        self.p_red = p_red
+        self.rng = np.random.default_rng(seed)
+
+        self.p_sum = np.zeros(n, dtype=np.int64)
+        self.d_sum = np.zeros(n, dtype=np.int64)
+        self.terminal = np.zeros(n, dtype=bool)
+
+        self.reset_batch()
+
+    @property
+    def state(self) -> tuple:
+        """
+        The environment state consists of the player scores, dealer scores and whether the games are terminal or not
+        :return: a three-tuple containing arrays of
+                    - Player scores
+                    - Dealer scores
+                    - Indications if the games are terminal
+        """
+        return self.p_sum, self.d_sum, self.terminal
+
+    def _draw_cards(self, n: int, force_black: bool = False) -> np.ndarray:
+        """
+        Draw a number of random cards from the pile. Follows the same distribution as Easy21._draw_card
+        :param n: The number of cards to be drawn
+        :param force_black: If set to true, all cards drawn will be black
+        :return: An array containing the values of the drawn cards (negative for red cards)
+        """
+        values = self.rng.integers(1, 11, size=n)
+        if force_black:
+            return values
+        return np.where(self.rng.random(size=n) > self.p_red, values, -values)
+
+    @staticmethod
+    def _valid_score(score: np.ndarray) -> np.ndarray:
+        """
+        Checks element-wise whether the given scores are greater or equal to 1 and smaller or equal than 21
+        :param score: The scores to be checked
+        :return: A boolean array indicating which scores are valid
+        """
+        return (1 <= score) & (score <= 21)
+
+    def _reward(self, p_sum: np.ndarray, d_sum: np.ndarray, terminal: np.ndarray) -> np.ndarray:
+        """
+        Determine the rewards of the given states. Follows the same rules as Easy21._reward
+        :param p_sum: Player scores of the states
+        :param d_sum: Dealer scores of the states
+        :param terminal: Indications if the states are terminal
+        :return: an array of rewards for the states
+        """
+        p_valid, d_valid = self._valid_score(p_sum), self._valid_score(d_sum)
+        reward = np.sign(p_sum - d_sum)                     # Compare scores if both are valid
+        reward[~d_valid] = 1                                # Invalid dealer score -> +1 reward
+        reward[~p_valid] = -1                               # Invalid player score -> -1 reward
+        reward[~terminal] = 0                               # Only terminal states give a nonzero reward
+        return reward
+
+    def _reset_games(self, mask: np.ndarray):
+        """
+        Draw new initial states for the games selected by the mask
+        :param mask: A boolean array indicating which games should be reset
+        """
+        n = np.count_nonzero(mask)
+        self.p_sum[mask] = self._draw_cards(n, force_black=True)
+        self.d_sum[mask] = self._draw_cards(n, force_black=True)
+        self.terminal[mask] = False
+
+    def step_batch(self, actions: np.ndarray) -> tuple:
+        """
+        Perform an action in each of the games
+        :param actions: A boolean array indicating for each game whether the player hits
+        :return: A four-tuple of arrays containing
+                    - Player scores after performing the actions
+                    - Dealer scores after performing the actions
+                    - Indications if the games ended
+                    - Rewards obtained from performing the actions
+                 Games that ended are reset afterwards, so the internal state holds their new initial states
+        """
+        hit = np.asarray(actions, dtype=bool)
+        assert hit.shape == (self.n,)
+
+        self.p_sum[hit] += self._draw_cards(np.count_nonzero(hit))          # Draw a card for hitting players
+        self.terminal[hit] = ~self._valid_score(self.p_sum[hit])            # Check if scores are still valid
+
+        stick = ~hit                                                        # Play the dealer for sticking players
+        playing = stick & self._valid_score(self.d_sum) & (self.d_sum < 17)
+        while playing.any():                                                # Keep drawing cards while dealer < 17
+            self.d_sum[playing] += self._draw_cards(np.count_nonzero(playing))
+            playing &= self._valid_score(self.d_sum) & (self.d_sum < 17)
+        self.terminal[stick] = True                                         # End games
+
+        p_sum, d_sum, terminal = self.p_sum.copy(), self.d_sum.copy(), self.terminal.copy()
+        reward = self._reward(p_sum, d_sum, terminal)
+        self._reset_games(terminal)                                         # Auto-reset finished games
+        return p_sum, d_sum, terminal, reward
+
+    def reset_batch(self) -> tuple:
+        """
+        Reset all games in the batch
+        :return: a three-tuple of arrays containing the initial player scores, dealer scores and terminal indications
+        """
+        self._reset_games(np.ones(self.n, dtype=bool))
+        return self.p_sum.copy(), self.d_sum.copy(), self.terminal.copy()
+
+    def get_state(self) -> tuple:
+        """
+        :return: a three-tuple containing copies of the player score, dealer score and terminal indication arrays
+        """
+        return self.p_sum.copy(), self.d_sum.copy(), self.terminal.copy()
+
+    def set_state(self, state: tuple):
+        """
+        Restore the states of all games in the batch
+        :param state: A three-tuple of player score, dealer score and terminal indication arrays
+        """
+        p_sum, d_sum, terminal = state
+        self.p_sum[:], self.d_sum[:], self.terminal[:] = p_sum, d_sum, terminal
+
 
 if __name__ == '__main__':
     from collections import Counter
@@ -237,3 +595,45 @@ if __name__ == '__main__':
             _o, _r = _env.step(_a)
         _rs += [_r]
     print(Counter(_rs))                             # Show outcome distribution
+
+    _batch = Easy21Batch(10000)                     # Play the same number of random games as a batch
+    _rs = np.zeros(_batch.n, dtype=np.int64)
+    _done = np.zeros(_batch.n, dtype=bool)
+    while not _done.all():                          # Only keep the outcome of the first game of each slot
+        _, _, _t, _r = _batch.step_batch(np.random.random(size=_batch.n) < 0.5)
+        _rs[_t & ~_done] = _r[_t & ~_done]
+        _done |= _t
+    print(Counter(_rs.tolist()))                    # Show outcome distribution
+
+    def _z(chi2: float, dof: int) -> float:             # Normal approximation of the chi-squared distribution
+        return (chi2 - dof) / np.sqrt(2 * dof)
+
+    _n = 100000                                     # Compare the dealer loop to the sampled final dealer score
+    _counts = dict()
+    for _fast in [False, True]:
+        _env = Easy21(seed=int(_fast), fast_dealer=_fast)
+        _c = _counts[_fast] = np.zeros(shape=(10, len(DEALER_SUMS)))
+        for _ in range(_n):
+            _env.reset()
+            _d = _env.d_sum
+            _o, _r = _env.step(Easy21.STICK)
+            _c[_d - 1, _o.d_sum - DEALER_SUMS[0]] += 1
+        _expected = dealer_distribution(_env.p_red)[:10] * _c.sum(axis=1, keepdims=True)
+        _mask = _expected > 0                       # Chi-squared goodness of fit against the exact distribution
+        assert not _c[~_mask].any()
+        _chi2 = (((_c - _expected) ** 2)[_mask] / _expected[_mask]).sum()
+        _dof = _mask.sum() - 10
+        print('fast_dealer={}: chi2={:.1f} with {} degrees of freedom (z={:.2f})'.format(
+            _fast, _chi2, _dof, _z(_chi2, _dof)))
+        assert abs(_z(_chi2, _dof)) < 4
+
+    _loop, _fast = _counts[False], _counts[True]    # Two-sample chi-squared test of the loop against the fast path
+    _pooled = _loop + _fast
+    _share = _loop.sum(axis=1, keepdims=True) / _pooled.sum(axis=1, keepdims=True)
+    _mask = _pooled > 0
+    _e_loop, _e_fast = (_pooled * _share)[_mask], (_pooled * (1 - _share))[_mask]
+    _chi2 = ((_loop[_mask] - _e_loop) ** 2 / _e_loop + (_fast[_mask] - _e_fast) ** 2 / _e_fast).sum()
+    _dof = _mask.sum() - 10
+    print('loop vs fast_dealer: chi2={:.1f} with {} degrees of freedom (z={:.2f})'.format(
+        _chi2, _dof, _z(_chi2, _dof)))
+    assert abs(_z(_chi2, _dof)) < 4
@@ -52,17 +52,20 @@ class FlappyBird(FiniteActionEnvironment):
     REST = FlappyBirdAction(False)
     ACTIONS = [REST, FLAP]
 
-    def __init__(self, size: tuple = (48, 48)):
+    def __init__(self, size: tuple = (48, 48), seed=24):
         """
         Create a new Flappy Bird Environment
         :param size: Game window dimensions
+        :param seed: Seed of the environment's random number generator. An int seed is also passed to the game's
+                     RandomState as is, so runs with the same int seed reproduce the game of earlier versions
         """
-        super().__init__()
+        super().__init__(seed)
         self.width, self.height = size
         self.game = ple.games.FlappyBird(width=self.width, height=self.height)
         self.game.screen = pygame.display.set_mode(self.game.getScreenDims(), 0, 32)
         self.game.clock = pygame.time.Clock()
-        self.game.rng = np.random.RandomState(24)
+        game_seed = seed if isinstance(seed, (int, np.integer)) else self.rng.integers(2 ** 32)
+        self.game.rng = np.random.RandomState(game_seed)
 
         self.game.rewards['loss'] = -1
         self.game.rewards['win'] = 1
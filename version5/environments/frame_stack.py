@@ -0,0 +1,148 @@
+import numpy as np
+
+from version5.core import State, Action, FiniteActionEnvironment
+
+"""
+    Environment wrapper that stacks the last k frames of a visual environment into a single observation, so a model can
+    infer motion from it
+"""
+
+
+class FrameStackState(State):
+    """
+        State of a FrameStack environment
+    """
+
+    def __init__(self, state, frames: np.ndarray, terminal: bool):
+        """
+        Create a new FrameStack State
+        :param state: The state of the wrapped environment
+        :param frames: View of the last k frames, of shape (k,) + frame shape (oldest frame first)
+        :param terminal: A boolean indicating whether the environment state is terminal
+        """
+        super().__init__(terminal)
+        self.env_state = state
+        self.frames = frames
+
+    @property
+    def state(self) -> np.ndarray:
+        """
+        :return: View of the last k frames with the frames along the last axis, of shape frame shape + (k,)
+        """
+        return np.moveaxis(self.frames, 0, -1)
+
+    @property
+    def frame(self) -> np.ndarray:
+        """
+        :return: View of the most recent frame
+        """
+        return self.frames[-1]
+
+    def __str__(self) -> str:
+        return str(self.env_state)
+
+
+class FrameStack(FiniteActionEnvironment):
+    """
+        Environment wrapper whose states hold the last k frames of the wrapped environment
+
+        Frames are written one after another into a preallocated buffer, so the last k frames are always a contiguous
+        slice of it and states get views of the buffer instead of copies. Once the end of the buffer is reached, the
+        last k - 1 frames are moved to its start. The frames of a state therefore stay valid while the next
+        buffer_size - k frames are written (one frame per step, k frames per reset), which is plenty for acting on
+        them. Replay memory should store the frames themselves (see FrameReplayBuffer)
+
+        At the start of an episode, the first frame is written k times to fill the stack
+    """
+
+    def __init__(self, env: FiniteActionEnvironment, k: int = 4, frame: callable = lambda s: s.state,
+                 buffer_size: int = 1024, dtype=np.uint8):
+        """
+        Create a new FrameStack environment
+        :param env: The visual environment to be wrapped
+        :param k: The number of frames in each state
+        :param frame: Function that gets the frame of a state of the wrapped environment
+        :param buffer_size: The number of frames that can be written before the buffer wraps around
+        :param dtype: The data type in which the frames are stored
+        """
+        super().__init__(env.rng)
+        assert k > 0
+        assert buffer_size >= 2 * k
+        self.env = env
+        self.k = k
+        self.frame = frame
+        self.buffer_size = buffer_size
+        self.dtype = dtype
+        self.buffer = None
+        self.position = -1                              # Position of the most recent frame in the buffer
+
+    def _allocate(self, frame: np.ndarray):
+        """
+        Allocate the frame buffer
+        :param frame: A frame of the wrapped environment
+        """
+        self.buffer = np.zeros((self.buffer_size + self.k - 1,) + frame.shape, dtype=self.dtype)
+
+    def _push(self, frame: np.ndarray):
+        """
+        Add a frame to the buffer
+        :param frame: The frame
+        """
+        if self.position + 1 == len(self.buffer):       # Move the last k - 1 frames to the start of the buffer
+            self.buffer[:self.k - 1] = self.buffer[len(self.buffer) - self.k + 1:]
+            self.position = self.k - 2
+        self.position += 1
+        self.buffer[self.position] = frame
+
+    def _state(self, state) -> FrameStackState:
+        """
+        :param state: A state of the wrapped environment
+        :return: the state containing a view of the last k frames
+        """
+        p = self.position
+        return FrameStackState(state, self.buffer[p - self.k + 1:p + 1], state.is_terminal())
+
+    def action_space(self) -> list:
+        return self.env.action_space()
+
+    def valid_actions_from(self, state) -> list:
+        return self.env.valid_actions_from(state.env_state)
+
+    def valid_actions(self) -> list:
+        return self.env.valid_actions()
+
+    def step(self, action: Action) -> tuple:
+        """
+        Perform an action on the current environment state
+        :param action: The action to be performed
+        :return: A two-tuple of (state, reward)
+        """
+        s, r = self.env.step(action)
+        self._push(self.frame(s))
+        return self._state(s), r
+
+    def reset(self) -> FrameStackState:
+        """
+        Reset the environment state
+        :return: A state containing the initial frame, repeated k times
+        """
+        s = self.env.reset()
+        frame = np.asarray(self.frame(s))
+        if self.buffer is None:
+            self._allocate(frame)
+        for _ in range(self.k):                         # Continue after the previous episode, so its views stay valid
+            self._push(frame)
+        return self._state(s)
+
+
+if __name__ == '__main__':
+    from version5.environments.pixelcopter import VisualPixelCopter
+
+    _e = FrameStack(VisualPixelCopter((48, 48)), k=4)
+
+    _s = _e.reset()
+    for _ in range(100):
+        _s, _r = _e.step(_e.sample())
+        if _s.is_terminal():
+            _s = _e.reset()
+    print(_s.state.shape, _s.state.base is not None, np.shares_memory(_s.frames, _e.buffer))
@@ -1,8 +1,10 @@
 if __name__ == '__main__':
     import numpy as np
     import matplotlib.pyplot as plt
+    from version5.agents.dynamic_programming import evaluate_policy
     from version5.agents.montecarlo import MonteCarlo
     from version5.environments.easy21 import Easy21
+    from version5.policy import GreedyPolicy
 
     env = Easy21()
 
@@ -14,6 +16,9 @@ if __name__ == '__main__':
 
     print(table)
 
+    _, expected_return = evaluate_policy(table.derive_policy(GreedyPolicy, env.valid_actions_from), env)
+    print('Expected return of the greedy policy: {:.4f}'.format(expected_return))
+
     vs = np.zeros(shape=(21, 10))
 
     for (state, action), value in table.items():
@@ -1,17 +1,19 @@
 if __name__ == '__main__':
     import keras as ks
-    import numpy as np
 
-    from version4.agents.deep_q import DeepQLearning
-    from version4.environments.pixelcopter import VisualPixelCopter
-    from version4.q_network import QNetwork
+    from version5.agents.deep_q import DeepQLearning
+    from version5.environments.frame_stack import FrameStack
+    from version5.environments.pixelcopter import VisualPixelCopter
+    from version5.q_network import QNetwork
+    from version5.replay_buffer import FrameReplayBuffer
 
     width, height = size = (32, 32)
-    env = VisualPixelCopter(size)
+    k = 4                                                       # Number of stacked frames, so velocity can be inferred
+    env = FrameStack(VisualPixelCopter(size), k)
     actions = env.valid_actions()
 
     nn = ks.models.Sequential()
-    nn.add(ks.layers.Conv2D(filters=16, kernel_size=(5, 5), activation='sigmoid', input_shape=size + (1,)))
+    nn.add(ks.layers.Conv2D(filters=16, kernel_size=(5, 5), activation='sigmoid', input_shape=size + (k,)))
     nn.add(ks.layers.Conv2D(filters=16, kernel_size=(5, 5), activation='sigmoid'))
     nn.add(ks.layers.Conv2D(filters=16, kernel_size=(5, 5), activation='sigmoid'))
     nn.add(ks.layers.Flatten())
@@ -23,12 +25,17 @@ if __name__ == '__main__':
 
     print(nn.summary())
 
+    def normalize_frames(frames):
+        return frames / 256
+
     def normalize_state(s):
-        return np.reshape(s.observation / 256, newshape=(1,) + size + (1,))
+        return normalize_frames(s.state[None])
 
 
     dqn = QNetwork(nn, actions, normalize_state)
 
-    dql = DeepQLearning(env, dqn)
+    replay = FrameReplayBuffer(capacity=100000, frame=lambda s: s.frame, normalize=normalize_frames, stack=k)
+
+    dql = DeepQLearning(env, dqn, replay_memory=replay)
 
     q = dql.learn()
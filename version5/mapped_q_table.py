@@ -0,0 +1,246 @@
+import os
+
+import numpy as np
+
+from version5.q_table import QTable
+
+
+class StateKey(int):
+    """
+        Key of a state in a MappedQTable. Yielded in place of the state when iterating through a table that cannot map
+        keys back to states. Can be used to index the table like the state itself
+    """
+    pass
+
+
+class MappedQTable(QTable):
+    """
+        Q Table implementation backed by a memory-mapped file, for state spaces that are too large to keep in memory
+
+        States are mapped to 64-bit integer keys that are stored in a fixed-size open-addressing hash table (using
+        linear probing). Each slot holds a row of Q-values, one for each action. Only the keys are stored, so states
+        with the same key would share their Q-values: the key function must be injective, e.g. by packing bounded
+        integer features of the state into a single integer. The table persists across runs without a load step, and
+        evaluator processes can open the same file read-only without copying it
+
+        File layout: a header of HEADER_SIZE int64s, followed by the keys, the Q-values and a mask indicating which
+        entries were set
+    """
+
+    MAGIC = 0x5154424C  # 'QTBL'
+    VERSION = 1
+    HEADER_SIZE = 8
+    EMPTY = -2 ** 63    # Key that marks an empty slot
+
+    def __init__(self, path: str, actions: list, state_key: callable, capacity: int = 2 ** 20,
+                 state_from_key: callable = None, mode: str = 'r+'):
+        """
+        Create or open a Memory-mapped Q Table
+        :param path: Path of the file backing the table. The file is created if it does not exist yet
+        :param actions: A list of all actions in the action space
+        :param state_key: Function mapping a state to a unique integer key in [-2^63 + 1, 2^63). It must be injective
+                          and give the same key for a state in every process and run. The built-in hash is not
+                          suitable: it collides (hash(-1) == hash(-2)), and hashes of strings and bytes change between
+                          runs unless PYTHONHASHSEED is fixed
+        :param capacity: The maximum number of states the table can hold (rounded up to a power of 2). Only used when
+                         creating a new file, otherwise the capacity is read from the file
+        :param state_from_key: Optional function mapping a key back to its state, used when iterating through the
+                               table. If left unspecified, iteration yields StateKeys in place of states
+        :param mode: 'r+' to open the table for reading and writing, 'r' to open an existing table read-only
+        """
+        assert mode in ('r', 'r+')
+        self.path = path
+        self.actions = list(actions)
+        self._action_index = {a: i for i, a in enumerate(self.actions)}
+        self.state_key = state_key
+        self.state_from_key = state_from_key
+        self.read_only = mode == 'r'
+
+        if not os.path.exists(path):
+            if self.read_only:
+                raise FileNotFoundError(path)
+            self._create(path, 1 << max(capacity - 1, 1).bit_length(), len(self.actions))
+
+        header = np.memmap(path, dtype=np.int64, mode='r', shape=(self.HEADER_SIZE,))
+        magic, version, capacity, num_actions = (int(x) for x in header[:4])
+        del header
+        if magic != self.MAGIC or version != self.VERSION:
+            raise Exception('{} is not a MappedQTable file!'.format(path))
+        if num_actions != len(self.actions):
+            raise Exception('MappedQTable file has {} actions, expected {}!'.format(num_actions, len(self.actions)))
+        self.capacity = capacity
+        self._mask = capacity - 1
+        self._shift = 64 - (capacity.bit_length() - 1)
+
+        offset = self.HEADER_SIZE * 8
+        self.keys = np.memmap(path, dtype=np.int64, mode=mode, offset=offset, shape=(capacity,))
+        offset += capacity * 8
+        self.table = np.memmap(path, dtype=np.float64, mode=mode, offset=offset, shape=(capacity, num_actions))
+        offset += capacity * num_actions * 8
+        self.stored = np.memmap(path, dtype=bool, mode=mode, offset=offset, shape=(capacity, num_actions))
+
+    @classmethod
+    def _create(cls, path: str, capacity: int, num_actions: int):
+        """
+        Create a new, empty table file
+        :param path: Path of the file
+        :param capacity: The number of slots in the table
+        :param num_actions: The number of actions in the action space
+        """
+        size = cls.HEADER_SIZE * 8 + capacity * 8 + capacity * num_actions * (8 + 1)
+        with open(path, 'wb') as f:                     # Allocate the file (sparse on most file systems)
+            f.truncate(size)
+        header = np.memmap(path, dtype=np.int64, mode='r+', shape=(cls.HEADER_SIZE,))
+        header[:4] = [cls.MAGIC, cls.VERSION, capacity, num_actions]
+        header.flush()
+        keys = np.memmap(path, dtype=np.int64, mode='r+', offset=cls.HEADER_SIZE * 8, shape=(capacity,))
+        keys[:] = cls.EMPTY
+        keys.flush()
+
+    def _slot(self, state, insert: bool = False) -> int:
+        """
+        Find the slot of a state in the hash table
+        :param state: The state to be found
+        :param insert: If set to true, the state is inserted into the table if it is not present yet
+        :return: the slot of the state, or -1 if the state is not in the table
+        """
+        key = int(state) if isinstance(state, StateKey) else int(self.state_key(state))
+        if key == self.EMPTY:
+            raise Exception('State key {} is reserved for empty slots!'.format(key))
+        i = ((key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> self._shift   # Fibonacci hashing of the key
+        keys = self.keys
+        for _ in range(self.capacity):
+            k = keys[i]
+            if k == key:
+                return i
+            if k == self.EMPTY:
+                if not insert:
+                    return -1
+                keys[i] = key
+                return i
+            i = (i + 1) & self._mask
+        if insert:
+            raise Exception('MappedQTable is full!')
+        return -1
+
+    def __getitem__(self, key: tuple) -> float:
+        """
+        Get the Q-value corresponding to the given key
+        :param key: A two-tuple of (state, action)
+        :return: The Q-value corresponding to the (state, action) pair. Return 0 if the pair is not in this table
+        """
+        s, a = key
+        i = self._slot(s)
+        return 0 if i < 0 else self.table[i, self._action_index[a]]
+
+    def __setitem__(self, key: tuple, value: float):
+        """
+        Set a Q-value for a given (state, action) pair
+        :param key: Two-tuple of (state, action)
+        :param value: Q-value corresponding to the key
+        """
+        if self.read_only:
+            raise Exception('MappedQTable is opened read-only!')
+        s, a = key
+        i, j = self._slot(s, insert=True), self._action_index[a]
+        self.table[i, j] = value
+        self.stored[i, j] = True
+
+    def __delitem__(self, key: tuple):
+        """
+        Remove an entry from this table. The slot of the state stays reserved
+        :param key: The (state, action) pair of the entry that should be removed
+        """
+        if self.read_only:
+            raise Exception('MappedQTable is opened read-only!')
+        s, a = key
+        i, j = self._slot(s), self._action_index[a]
+        if i < 0 or not self.stored[i, j]:
+            raise KeyError(key)
+        self.table[i, j] = 0
+        self.stored[i, j] = False
+
+    def __iter__(self):
+        """
+        :return: An iterator that iterates through all (state, action) pairs stored in this table. States are given as
+                 their StateKeys if no state_from_key function was specified
+        """
+        for i, j in zip(*np.nonzero(self.stored)):
+            k = StateKey(self.keys[i])
+            yield (k if self.state_from_key is None else self.state_from_key(k), self.actions[j])
+
+    def iter_rows(self):
+        """
+        :return: An iterator that iterates through all (state, action, value) triples stored in this table. States are
+                 given as their StateKeys if no state_from_key function was specified
+        """
+        for i, j in zip(*np.nonzero(self.stored)):
+            k = StateKey(self.keys[i])
+            yield (k if self.state_from_key is None else self.state_from_key(k), self.actions[j], self.table[i, j])
+
+    def __len__(self) -> int:
+        """
+        :return: The number of entries in this table
+        """
+        return int(np.count_nonzero(self.stored))
+
+    def Qs(self, state, actions):
+        """
+        Obtain all Q-values for multiple possible actions given the state
+        :param state: The obtained state
+        :param actions: A list of actions for which the Q-value should be obtained
+        :return: A dictionary mapping each action to the corresponding Q-value
+        """
+        i = self._slot(state)
+        if i < 0:
+            return {a: 0 for a in actions}
+        row = self.table[i]
+        return {a: row[self._action_index[a]] for a in actions}
+
+    def Qs_batch(self, states, actions) -> np.ndarray:
+        """
+        Obtain the Q-values of multiple possible actions for multiple states at once
+        :param states: A list of states
+        :param actions: A list of actions for which the Q-values should be obtained
+        :return: An array of shape (len(states), len(actions)) where entry [i, j] is Q(states[i], actions[j])
+        """
+        slots = np.array([self._slot(s) for s in states], dtype=np.int64)
+        columns = [self._action_index[a] for a in actions]
+        qs = self.table[np.maximum(slots, 0)][:, columns]
+        qs[slots < 0] = 0                               # States that are not in the table have Q-values of 0
+        return qs
+
+    def flush(self):
+        """
+        Write all changes to the backing file
+        """
+        if not self.read_only:
+            self.keys.flush()
+            self.table.flush()
+            self.stored.flush()
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    _path = os.path.join(tempfile.mkdtemp(), 'q_table.bin')
+    _actions = [False, True]
+
+    def _key(s: tuple) -> int:                          # Pack three features in [0, 2^20) into one key
+        return s[0] << 40 | s[1] << 20 | s[2]
+
+    def _from_key(k: int) -> tuple:
+        return k >> 40, k >> 20 & 0xFFFFF, k & 0xFFFFF
+
+    _table = MappedQTable(_path, _actions, _key, capacity=1024, state_from_key=_from_key)
+    _table[(1, 2, 3), True] = 1
+    _table[(1, 2, 3), False] += 2
+    _table[(4, 5, 6), True] = 3
+    _table.flush()
+    del _table
+
+    _reader = MappedQTable(_path, _actions, _key, state_from_key=_from_key, mode='r')   # Reopen without a load step
+    print(_reader[(1, 2, 3), False])
+    print(_reader.Qs((4, 5, 6), _actions))
+    print(len(_reader))
+    print(_reader)
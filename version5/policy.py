@@ -1,5 +1,7 @@
 import numpy as np
 
+from version5.core import _index
+
 
 class Policy:
     """
@@ -9,6 +11,14 @@ class Policy:
         NOTE: Only supports policies over finite action spaces!
     """
 
+    def __init__(self, seed=None):
+        """
+        Create a new Policy
+        :param seed: Seed of the random number generator used for sampling actions. Can be an int, a SeedSequence or
+                     a numpy Generator. If left unspecified, the generator is seeded randomly
+        """
+        self.rng = np.random.default_rng(seed)
+
     def _actions_from(self, state) -> list:
         """
         Gets all valid actions that can be executed on the state
@@ -25,6 +35,20 @@ class Policy:
         """
         raise NotImplementedError
 
+    def _actions_values_batch_from(self, states) -> tuple:
+        """
+        Get the valid actions of a batch of states, as well as values to base the policy on. All states in the batch
+        should have the same valid actions
+        :param states: A non-empty list of states
+        :return: a two-tuple of
+                    - a list of the valid actions
+                    - an array of shape (len(states), len(actions)) where entry [i, j] is the value of actions[j] at
+                      states[i]
+        """
+        actions = self._actions_from(states[0])
+        values = [self._actions_values_from(s) for s in states]
+        return actions, np.array([[v[a] for a in actions] for v in values], dtype=float)
+
     def p(self, action, state):
         """
         Get the probability of taking an action from the specified state (as dictated by this policy)
@@ -58,7 +82,50 @@ class Policy:
         """
         dist = self.distribution(state)
         actions, probabilities = zip(*dist.items())
-        return np.random.choice(actions, p=probabilities)
+        return actions[self.rng.choice(len(actions), p=probabilities)]
+
+    def distribution_batch(self, states) -> np.ndarray:
+        """
+        Get the probability distributions over all actions that can be taken from a batch of states
+        :param states: A non-empty list of states that have the same valid actions
+        :return: An array of shape (len(states), len(actions)) where entry [i, j] is the probability of taking action j
+                 at states[i]. Actions are ordered as in self._actions_from(states[0])
+        """
+        _, values = self._actions_values_batch_from(states)
+        values = values + np.abs(values.min(axis=1, keepdims=True))  # Add an offset so negative numbers are removed
+        total = values.sum(axis=1, keepdims=True)
+        uniform = np.full_like(values, 1 / values.shape[1])
+        return np.where(total == 0, uniform, values / np.where(total == 0, 1, total))
+
+    def sample_batch(self, states) -> np.ndarray:
+        """
+        Sample an action for each state in a batch of states from this policy
+        :param states: A non-empty list of states that have the same valid actions
+        :return: An array containing the index of the sampled action of each state. Actions are ordered as in
+                 self._actions_from(states[0])
+        """
+        cdf = np.cumsum(self.distribution_batch(states), axis=1)
+        u = self.rng.random(len(cdf))[:, None] * cdf[:, -1:]      # Scale to the total to be robust to rounding
+        return np.minimum((cdf <= u).sum(axis=1), cdf.shape[1] - 1)
+
+    def freeze(self, states, state_index: callable = _index) -> 'FrozenPolicy':
+        """
+        Compile this policy into a lookup table that holds the greedy action (with respect to the policy values) for
+        each of the given states
+        :param states: The enumerable states that should be frozen, e.g. all non-terminal states of the environment
+        :param state_index: Function that maps a state to a dense, non-negative index. Defaults to state.index()
+        :return: a FrozenPolicy
+        """
+        return FrozenPolicy(self, states, state_index)
+
+    def cache_distributions(self, buffer_size: int = 65536) -> 'AliasPolicy':
+        """
+        Cache the distribution of this policy for each state it is queried on, and sample from the cached distributions
+        in constant time with the alias method. Only valid if the distribution of a state does not change
+        :param buffer_size: The number of uniform numbers that are drawn in advance each time the buffer runs out
+        :return: an AliasPolicy
+        """
+        return AliasPolicy(self, buffer_size)
 
     def __call__(self, action, state):
         return self.p(action, state)
@@ -83,7 +150,7 @@ class GreedyPolicy(Policy):
         """
         values = self._actions_values_from(state)
         a = max(values, key=values.get)
-        return {1 if a == a_p else 0 for a_p in values.keys()}  # Since the policy samples greedily, p=1 for one action
+        return {a_p: 1 if a == a_p else 0 for a_p in values.keys()}  # The policy samples greedily, p=1 for one action
 
     def sample(self, state):
         """
@@ -94,6 +161,28 @@ class GreedyPolicy(Policy):
         values = self._actions_values_from(state)
         return max(values, key=values.get)
 
+    def distribution_batch(self, states) -> np.ndarray:
+        """
+        Get the probability distributions over all actions that can be taken from a batch of states
+        :param states: A non-empty list of states that have the same valid actions
+        :return: An array of shape (len(states), len(actions)) where entry [i, j] is the probability of taking action j
+                 at states[i]. Actions are ordered as in self._actions_from(states[0])
+        """
+        _, values = self._actions_values_batch_from(states)
+        dist = np.zeros_like(values)
+        dist[np.arange(len(values)), values.argmax(axis=1)] = 1
+        return dist
+
+    def sample_batch(self, states) -> np.ndarray:
+        """
+        Sample an action for each state in a batch of states from this policy
+        :param states: A non-empty list of states that have the same valid actions
+        :return: An array containing the index of the greedy action of each state. Actions are ordered as in
+                 self._actions_from(states[0])
+        """
+        _, values = self._actions_values_batch_from(states)
+        return values.argmax(axis=1)                                # Ties are broken by the first action, like max
+
 
 class EpsilonGreedyPolicy(Policy):
     """
@@ -101,11 +190,13 @@ class EpsilonGreedyPolicy(Policy):
         greedily otherwise
     """
 
-    def __init__(self, epsilon: callable):
+    def __init__(self, epsilon: callable, seed=None):
         """
         Create a new EpsilonGreedyPolicy
         :param epsilon: A function that returns a probability epsilon when given a state
+        :param seed: Seed of the random number generator used for sampling actions
         """
+        super().__init__(seed)
         self.epsilon = epsilon
 
     def _actions_from(self, state):
@@ -132,12 +223,262 @@ class EpsilonGreedyPolicy(Policy):
         :param state: The state at which the action should be taken
         :return: the sampled action
         """
-        if np.random.random() < self.epsilon(state):
+        if self.rng.random() < self.epsilon(state):
             actions = self._actions_from(state)
-            return actions[np.random.randint(0, len(actions) - 1)]  # Sample uniformly
+            return actions[self.rng.integers(len(actions))]         # Sample uniformly
         else:
             return super(EpsilonGreedyPolicy, self).sample(state)   # Sample greedily
 
+    def distribution_batch(self, states) -> np.ndarray:
+        """
+        Get the probability distributions over all actions that can be taken from a batch of states
+        :param states: A non-empty list of states that have the same valid actions
+        :return: An array of shape (len(states), len(actions)) where entry [i, j] is the probability of taking action j
+                 at states[i]. Actions are ordered as in self._actions_from(states[0])
+        """
+        epsilon = np.array([self.epsilon(s) for s in states], dtype=float)[:, None]
+        _, values = self._actions_values_batch_from(states)
+        dist = np.zeros_like(values)
+        dist[np.arange(len(values)), values.argmax(axis=1)] = 1
+        return (1 - epsilon) * dist + epsilon / values.shape[1]
+
+    def sample_batch(self, states) -> np.ndarray:
+        """
+        Sample an action for each state in a batch of states from this policy
+        :param states: A non-empty list of states that have the same valid actions
+        :return: An array containing the index of the sampled action of each state. Actions are ordered as in
+                 self._actions_from(states[0])
+        """
+        epsilon = np.array([self.epsilon(s) for s in states], dtype=float)
+        _, values = self._actions_values_batch_from(states)
+        explore = self.rng.random(len(states)) < epsilon                # One coin flip for each state
+        uniform = self.rng.integers(values.shape[1], size=len(states))  # Sample uniformly
+        return np.where(explore, uniform, values.argmax(axis=1))        # Sample greedily otherwise
+
+
+class FrozenPolicy(GreedyPolicy):
+    """
+        Greedy policy compiled into a lookup table, for low-latency inference. The greedy action of every frozen state
+        is computed once, so acting on these states is a single list lookup. States that were not frozen (or that have
+        no index) fall back to the values of the live estimator the policy was frozen from
+    """
+
+    def __init__(self, policy: Policy, states, state_index: callable = _index):
+        """
+        Create a new FrozenPolicy. See Policy.freeze
+        :param policy: The policy that should be frozen
+        :param states: The enumerable states that should be frozen
+        :param state_index: Function that maps a state to a dense, non-negative index. Defaults to state.index()
+        """
+        super().__init__(seed=policy.rng)
+        self._actions_from = policy._actions_from
+        self._actions_values_from = policy._actions_values_from     # Live estimator, used for states not frozen
+        self._actions_values_batch_from = policy._actions_values_batch_from
+        self.state_index = state_index
+
+        states = list(states)
+        indices = [state_index(s) for s in states]
+        actions, positions = [], dict()
+        self.greedy = np.full(max(indices, default=-1) + 1, -1, dtype=np.int64)  # Position of each greedy action
+        for s, i in zip(states, indices):
+            values = self._actions_values_from(s)
+            a = max(values, key=values.get)
+            if a not in positions:
+                positions[a] = len(actions)
+                actions.append(a)
+            self.greedy[i] = positions[a]
+
+        self.actions = np.empty(len(actions), dtype=object)        # Assigned one by one, actions may be tuples
+        for k, a in enumerate(actions):
+            self.actions[k] = a
+        self._table = [None if k < 0 else actions[k] for k in self.greedy.tolist()]
+
+    def _index_of(self, state) -> int:
+        """
+        :param state: A state
+        :return: The index of the state, or -1 if the state has no index
+        """
+        try:
+            return self.state_index(state)
+        except (AttributeError, ValueError):
+            return -1
+
+    def act(self, state):
+        """
+        Get the greedy action at the given state
+        :param state: The state at which the action should be taken
+        :return: the greedy action
+        """
+        i = self._index_of(state)
+        a = self._table[i] if 0 <= i < len(self._table) else None
+        return super().sample(state) if a is None else a
+
+    def act_batch(self, states) -> list:
+        """
+        Get the greedy actions at multiple states at once
+        :param states: A list of states
+        :return: a list containing the greedy action of each state
+        """
+        indices = np.array([self._index_of(s) for s in states], dtype=np.int64)
+        positions = self.act_indices(indices)
+        result = self.actions[positions] if len(self.actions) else np.empty(len(states), dtype=object)
+        for k in np.flatnonzero(positions < 0).tolist():           # Fall back to the live estimator
+            result[k] = super().sample(states[k])
+        return result.tolist()
+
+    def act_indices(self, indices: np.ndarray) -> np.ndarray:
+        """
+        Get the greedy actions of multiple states given by their indices
+        :param indices: An array of state indices
+        :return: an array containing the position in self.actions of the greedy action of each state, or -1 for
+                 states that were not frozen
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        valid = (0 <= indices) & (indices < len(self.greedy))
+        return np.where(valid, self.greedy[np.where(valid, indices, 0)] if len(self.greedy) else -1, -1)
+
+    def distribution(self, state):
+        """
+        Get a probability distribution over all actions that can be taken from the state
+        :param state: The state from which the actions are taken
+        :return: A dict mapping all actions to their probability
+        """
+        a = self.act(state)
+        return {a_p: 1 if a == a_p else 0 for a_p in self._actions_from(state)}
+
+    def distribution_batch(self, states) -> np.ndarray:
+        """
+        Get the probability distributions over all actions that can be taken from a batch of states
+        :param states: A non-empty list of states that have the same valid actions
+        :return: An array of shape (len(states), len(actions)) where entry [i, j] is the probability of taking action j
+                 at states[i]. Actions are ordered as in self._actions_from(states[0])
+        """
+        indices = self.sample_batch(states)
+        dist = np.zeros(shape=(len(indices), len(self._actions_from(states[0]))))
+        dist[np.arange(len(indices)), indices] = 1
+        return dist
+
+    def sample_batch(self, states) -> np.ndarray:
+        """
+        Get the greedy action of each state in a batch of states
+        :param states: A non-empty list of states that have the same valid actions
+        :return: An array containing the index of the greedy action of each state. Actions are ordered as in
+                 self._actions_from(states[0])
+        """
+        column = {a: j for j, a in enumerate(self._actions_from(states[0]))}
+        return np.array([column[a] for a in self.act_batch(states)], dtype=np.int64)
+
+    def sample(self, state):
+        """
+        Sample an action to take at the given state from this policy
+        :param state: The state at which the action should be taken
+        :return: the greedy action
+        """
+        return self.act(state)
+
+
+class AliasTable:
+    """
+        Alias table of a discrete probability distribution (built with Vose's method), from which an outcome can be
+        sampled in constant time using a single uniform number
+    """
+
+    __slots__ = ('outcomes', 'prob', 'alias')
+
+    def __init__(self, distribution: dict):
+        """
+        Create a new AliasTable
+        :param distribution: A dict mapping each outcome to its probability
+        """
+        self.outcomes = list(distribution.keys())
+        n = len(self.outcomes)
+        total = sum(distribution.values())
+        scaled = [p * n / total for p in distribution.values()]
+        self.prob, self.alias = [1.0] * n, list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            i, j = small.pop(), large.pop()
+            self.prob[i], self.alias[i] = scaled[i], j              # Fill the rest of column i with outcome j
+            scaled[j] -= 1 - scaled[i]
+            (small if scaled[j] < 1 else large).append(j)
+        # Columns left in either list are (up to rounding) full, so they keep probability 1
+
+    def sample(self, u: float):
+        """
+        Sample an outcome
+        :param u: A uniform number in [0, 1)
+        :return: the sampled outcome
+        """
+        x = u * len(self.prob)
+        i = int(x)                                          # The integer part picks a column, the rest flips its coin
+        return self.outcomes[i] if x - i < self.prob[i] else self.outcomes[self.alias[i]]
+
+
+class AliasPolicy(Policy):
+    """
+        Policy that caches the distribution of another policy for each state, and samples from it in constant time
+        using alias tables. The alias table of a state is built the first time the state is sampled
+    """
+
+    def __init__(self, policy: Policy, buffer_size: int = 65536):
+        """
+        Create a new AliasPolicy. See Policy.cache_distributions
+        :param policy: The policy of which the distributions should be cached. The distribution of a state should not
+                       change after it is cached
+        :param buffer_size: The number of uniform numbers that are drawn in advance each time the buffer runs out
+        """
+        super().__init__(seed=policy.rng)
+        assert buffer_size > 0
+        self.policy = policy
+        self._actions_from = policy._actions_from
+        self._distributions, self._tables = dict(), dict()
+        self.buffer_size = buffer_size
+        self._uniforms, self._uniform_index = [], buffer_size
+
+    def _uniform(self) -> float:
+        """
+        :return: A uniform number in [0, 1) from the buffer
+        """
+        if self._uniform_index >= self.buffer_size:         # Refill the buffer with a single call
+            self._uniforms, self._uniform_index = self.rng.random(self.buffer_size).tolist(), 0
+        u = self._uniforms[self._uniform_index]
+        self._uniform_index += 1
+        return u
+
+    def distribution(self, state):
+        """
+        Get a probability distribution over all actions that can be taken from the state
+        :param state: The state from which the actions are taken
+        :return: A dict mapping all actions to their probability
+        """
+        dist = self._distributions.get(state)
+        if dist is None:
+            dist = self._distributions[state] = self.policy.distribution(state)
+        return dict(dist)
+
+    def distribution_batch(self, states) -> np.ndarray:
+        """
+        Get the probability distributions over all actions that can be taken from a batch of states
+        :param states: A non-empty list of states that have the same valid actions
+        :return: An array of shape (len(states), len(actions)) where entry [i, j] is the probability of taking action j
+                 at states[i]. Actions are ordered as in self._actions_from(states[0])
+        """
+        actions = self._actions_from(states[0])
+        dists = [self.distribution(s) for s in states]
+        return np.array([[d.get(a, 0) for a in actions] for d in dists], dtype=float)
+
+    def sample(self, state):
+        """
+        Sample an action to take at the given state from this policy
+        :param state: The state at which the action should be taken
+        :return: the sampled action
+        """
+        table = self._tables.get(state)
+        if table is None:
+            table = self._tables[state] = AliasTable(self.distribution(state))
+        return table.sample(self._uniform())
+
 
 if __name__ == '__main__':
 
@@ -156,5 +497,8 @@ if __name__ == '__main__':
 
     print(_p, _dist, _a, _prob)
 
+    print(_p.distribution_batch([None] * 3))
+    print(np.bincount(_p.sample_batch([None] * 10000), minlength=5))
+
 
 
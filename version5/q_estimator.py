@@ -1,3 +1,5 @@
+import numpy as np
+
 from version5.policy import Policy
 
 
@@ -24,6 +26,26 @@ class QEstimator:
         """
         raise NotImplementedError
 
+    def Qs_batch(self, observations, actions) -> np.ndarray:
+        """
+        Obtain the Q-values of multiple possible actions for multiple observations at once
+        :param observations: A list of obtained observations
+        :param actions: A list of actions for which the Q-values should be obtained
+        :return: An array of shape (len(observations), len(actions)) where entry [i, j] is Q(observations[i], actions[j])
+        """
+        qs = [self.Qs(o, actions) for o in observations]
+        return np.array([[q[a] for a in actions] for q in qs], dtype=float).reshape(len(qs), len(actions))
+
+    def _actions_values_batch(self, observations, sa_map: callable) -> tuple:
+        """
+        Obtain the valid actions and their Q-values for a batch of observations that have the same valid actions
+        :param observations: A non-empty list of observations
+        :param sa_map: A function that maps a state to the actions that can be performed on that state
+        :return: a two-tuple of (list of actions, array of Q-values of shape (len(observations), len(actions)))
+        """
+        actions = sa_map(observations[0])
+        return actions, self.Qs_batch(observations, actions)
+
     def derive_policy(self, policy_class: callable, sa_map: callable, **kwargs) -> Policy:
         """
         Obtain a policy following from this QEstimator
@@ -36,6 +58,7 @@ class QEstimator:
         if isinstance(p, Policy):   # Set missing policy methods
             p._actions_from = sa_map
             p._actions_values_from = lambda s: self.Qs(s, sa_map(s))
+            p._actions_values_batch_from = lambda ss: self._actions_values_batch(ss, sa_map)
             return p
         else:
             raise Exception('policy_class must return Policy object!')
@@ -21,6 +21,7 @@ class QNetwork(QEstimator):
         self.model = model
         self.phi = feature_ex
         self.out_map = out_map
+        self.out_index = {a: i for i, a in enumerate(out_map)}  # Maps each action to its output index
         self.gamma = gamma
 
     def Q(self, state, action) -> float:
@@ -49,25 +50,39 @@ class QNetwork(QEstimator):
         else:
             return {a: v for a, v in pi.items() if a in actions}
 
-    def fit_on_samples(self, samples):
+    def Qs_batch(self, states, actions=None) -> np.ndarray:
         """
-        Train the network on a minibatch of samples
-        :param samples: A list of four-tuples (State, Action, Reward, Next State)
+        Predict the Q values of multiple states in a single forward pass
+        :param states: A list of states
+        :param actions: Optional list of actions that the result should be restricted to (in the given order).
+                        If left unspecified, all actions in the action space are given in the order of out_map
+        :return: An array of shape (len(states), len(actions)) where entry [i, j] is Q(states[i], actions[j])
         """
-        for s, a, r, s_p in samples:                                             # Iterate through all samples
-            phi_s = self.phi(s)                                                  # Prepare state for model input
-            phi_p = self.phi(s_p)
-            qs = self.model.predict([phi_s])[0]                                  # Compute model output
-            qp = self.model.predict([phi_p])[0]
-            if s_p.is_terminal():                                                # Get model target
-                qs[self.out_map.index(a)] = r
-            else:
-                qs[self.out_map.index(a)] = r + self.gamma * max(qp)
-            self.model.fit(x=phi_s,                                              # Train model on target
-                           y=np.reshape(qs, newshape=(1, len(self.out_map))),
-                           epochs=1,
-                           verbose=2
-                           )
+        x = np.concatenate([self.phi(s) for s in states])                   # Stack the model inputs of all states
+        out = self.model.predict(x)
+        if actions is None:
+            return out
+        return out[:, [self.out_index[a] for a in actions]]
+
+    def fit_on_batch(self, x: np.ndarray, actions: np.ndarray, rewards: np.ndarray, x_p: np.ndarray,
+                     terminal: np.ndarray, weights: np.ndarray = None) -> np.ndarray:
+        """
+        Train the network on a minibatch of samples given as arrays, with a single forward pass and gradient step
+        :param x: The model inputs of the states, stacked along the first axis
+        :param actions: The indices (in out_map) of the performed actions
+        :param rewards: The obtained rewards
+        :param x_p: The model inputs of the next states, stacked along the first axis
+        :param terminal: Boolean array indicating which next states are terminal
+        :param weights: Optional per-sample weights of the loss (e.g. importance-sampling weights)
+        :return: the TD errors of the samples (before the gradient step)
+        """
+        n = len(x)
+        out = self.model.predict(np.concatenate([x, x_p]))                    # One forward pass for s and s'
+        qs, qp = out[:n], out[n:]
+        targets = np.array(qs, copy=True)                                     # Only the performed action gets a target
+        targets[np.arange(n), actions] = rewards + self.gamma * np.where(terminal, 0, qp.max(axis=1))
+        self.model.train_on_batch(x, targets, sample_weight=weights)
+        return targets[np.arange(n), actions] - qs[np.arange(n), actions]
 
 
 if __name__ == '__main__':
@@ -1,5 +1,11 @@
 import collections
+import csv
+import itertools
+import os
 
+import numpy as np
+
+from version5.core import _index
 from version5.q_estimator import QEstimator
 
 
@@ -8,6 +14,8 @@ class QTable(collections.MutableMapping, QEstimator):
         Q Table implementation
     """
 
+    SUMMARY_ROWS = 10   # Number of rows shown at the start and end of the string representation
+
     def __init__(self, *args, **kwargs):
         """
         Create a new Q Table
@@ -57,15 +65,67 @@ class QTable(collections.MutableMapping, QEstimator):
 
     def __str__(self) -> str:
         """
-        :return: A pretty string representation  TODO -- fix
+        :return: A pretty string representation. Large tables are summarized by their first and last rows
+        """
+        head, tail, n = [], collections.deque(maxlen=self.SUMMARY_ROWS), 0
+        for row in self.iter_rows():                        # Keep only the rows that are shown
+            if n < self.SUMMARY_ROWS:
+                head.append(row)
+            else:
+                tail.append(row)
+            n += 1
+        t_entry = '| {:<40} | {:8.3f} |'
+        lines = ['| Q Table                                    Value    |',
+                 '+------------------------------------------+----------+']
+        lines += [t_entry.format(str(s) + ', ' + str(a), v) for s, a, v in head]
+        if n > len(head) + len(tail):
+            lines.append('| {:^51} |'.format('... {} more entries ...'.format(n - len(head) - len(tail))))
+        lines += [t_entry.format(str(s) + ', ' + str(a), v) for s, a, v in tail]
+        lines.append('+------------------------------------------+----------+')
+        return '\n'.join(lines) + '\n'
+
+    def iter_rows(self):
+        """
+        :return: An iterator that iterates through all (state, action, value) triples stored in this table
+        """
+        for state, actions in self.store.items():
+            for action, value in actions.items():
+                yield (state, action, value)
+
+    def to_csv(self, f, chunk_size: int = 10000):
+        """
+        Write all entries of this table to a CSV file. Rows are written in chunks, so memory usage does not grow with
+        the size of the table
+        :param f: A path or a writable text buffer
+        :param chunk_size: The number of rows that are written at once
+        """
+        if isinstance(f, (str, os.PathLike)):
+            with open(f, 'w', newline='') as file:
+                return self.to_csv(file, chunk_size)
+        writer = csv.writer(f)
+        writer.writerow(('state', 'action', 'value'))
+        rows = self.iter_rows()
+        chunk = list(itertools.islice(rows, chunk_size))
+        while chunk:
+            writer.writerows(chunk)
+            chunk = list(itertools.islice(rows, chunk_size))
+
+    def to_numpy(self, state_index: callable = None, action_index: callable = None) -> np.ndarray:
+        """
+        Export all entries of this table to a structured array with fields 'state', 'action' and 'value'
+        :param state_index: Optional function mapping a state to an integer index. If left unspecified, the states
+                            themselves are stored (as objects)
+        :param action_index: Optional function mapping an action to an integer index. If left unspecified, the
+                             actions themselves are stored (as objects)
+        :return: the structured array
         """
-        t = '| Q Table                                    Value    |\n'
-        t += '+------------------------------------------+----------+\n'
-        t_entry = '| {:<40} | {:8.3f} |\n'
-        for s, a in self:
-            t += t_entry.format(str(s) + ', ' + str(a), self[s, a])
-        t += '+------------------------------------------+----------+\n'
-        return t
+        dtype = np.dtype([('state', object if state_index is None else np.int64),
+                          ('action', object if action_index is None else np.int64),
+                          ('value', np.float64)])
+        rows = np.empty(len(self), dtype=dtype)
+        for i, (s, a, v) in enumerate(self.iter_rows()):
+            rows[i] = (s if state_index is None else state_index(s), a if action_index is None else action_index(a), v)
+        return rows
 
     def Q(self, state, action):
         """
@@ -85,6 +145,185 @@ class QTable(collections.MutableMapping, QEstimator):
         """
         return {a: self[state, a] for a in actions}
 
+    def Qs_batch(self, states, actions) -> np.ndarray:
+        """
+        Obtain the Q-values of multiple possible actions for multiple states at once
+        :param states: A list of states
+        :param actions: A list of actions for which the Q-values should be obtained
+        :return: An array of shape (len(states), len(actions)) where entry [i, j] is Q(states[i], actions[j])
+        """
+        qs = np.zeros(shape=(len(states), len(actions)))
+        for i, s in enumerate(states):
+            values = self.store.get(s)
+            if values:                                  # States that are not in the table keep Q-values of 0
+                qs[i] = [values.get(a, 0) for a in actions]
+        return qs
+
+
+class DenseQTable(QTable):
+    """
+        Q Table implementation for enumerable state and action spaces. The Q-values are stored in a 2-D array indexed
+        by (state index, action index)
+    """
+
+    def __init__(self, num_states: int, num_actions: int, state_from_index: callable, action_from_index: callable,
+                 state_index: callable = _index, action_index: callable = _index, *args, **kwargs):
+        """
+        Create a new Dense Q Table
+        :param num_states: The number of states in the state space
+        :param num_actions: The number of actions in the action space
+        :param state_from_index: Function that maps a state index to its state
+        :param action_from_index: Function that maps an action index to its action
+        :param state_index: Function that maps a state to its index in [0, num_states). Defaults to state.index()
+        :param action_index: Function that maps an action to its index in [0, num_actions). Defaults to action.index()
+        """
+        self.table = np.zeros(shape=(num_states, num_actions))
+        self.stored = np.zeros(shape=(num_states, num_actions), dtype=bool)   # Indicates which entries were set
+        self.state_index, self.action_index = state_index, action_index
+        self.state_from_index, self.action_from_index = state_from_index, action_from_index
+        self.update(dict(*args, **kwargs))
+
+    def __getitem__(self, key: tuple) -> float:
+        """
+        Get the Q-value corresponding to the given key
+        :param key: A two-tuple of (state, action)
+        :return: The Q-value corresponding to the (state, action) pair. Return 0 if the pair is not in this table
+        """
+        s, a = key
+        return self.table[self.state_index(s), self.action_index(a)]
+
+    def __setitem__(self, key: tuple, value: float):
+        """
+        Set a Q-value for a given (state, action) pair
+        :param key: Two-tuple of (state, action)
+        :param value: Q-value corresponding to the key
+        """
+        s, a = key
+        i, j = self.state_index(s), self.action_index(a)
+        self.table[i, j] = value
+        self.stored[i, j] = True
+
+    def __delitem__(self, key: tuple):
+        """
+        Remove an entry from this table
+        :param key: The (state, action) pair of the entry that should be removed
+        """
+        s, a = key
+        i, j = self.state_index(s), self.action_index(a)
+        if not self.stored[i, j]:
+            raise KeyError(key)
+        self.table[i, j] = 0
+        self.stored[i, j] = False
+
+    def __iter__(self):
+        """
+        :return: An iterator that iterates through all (state, action) pairs stored in this table
+        """
+        for i, j in zip(*np.nonzero(self.stored)):
+            yield (self.state_from_index(int(i)), self.action_from_index(int(j)))
+
+    def __len__(self) -> int:
+        """
+        :return: The number of entries in this table
+        """
+        return int(np.count_nonzero(self.stored))
+
+    def iter_rows(self):
+        """
+        :return: An iterator that iterates through all (state, action, value) triples stored in this table
+        """
+        for i, j in zip(*np.nonzero(self.stored)):
+            yield (self.state_from_index(int(i)), self.action_from_index(int(j)), self.table[i, j])
+
+    def to_numpy(self, state_index: callable = None, action_index: callable = None) -> np.ndarray:
+        """
+        Export all entries of this table to a structured array with fields 'state', 'action' and 'value'. If the index
+        functions of this table are passed, the indices are exported without mapping them back to states and actions
+        :param state_index: Optional function mapping a state to an integer index. If left unspecified, the states
+                            themselves are stored (as objects)
+        :param action_index: Optional function mapping an action to an integer index. If left unspecified, the
+                             actions themselves are stored (as objects)
+        :return: the structured array
+        """
+        states, actions = np.nonzero(self.stored)
+        dtype = np.dtype([('state', object if state_index is None else np.int64),
+                          ('action', object if action_index is None else np.int64),
+                          ('value', np.float64)])
+        rows = np.empty(len(states), dtype=dtype)
+        rows['state'] = self._export_column(states, self.state_from_index, self.state_index, state_index)
+        rows['action'] = self._export_column(actions, self.action_from_index, self.action_index, action_index)
+        rows['value'] = self.table[states, actions]
+        return rows
+
+    @staticmethod
+    def _export_column(indices: np.ndarray, from_index: callable, own_index: callable, index: callable) -> np.ndarray:
+        """
+        Convert a column of indices of this table for to_numpy
+        :param indices: The indices in this table
+        :param from_index: Function that maps an index of this table to its state or action
+        :param own_index: The index function of this table
+        :param index: The index function that was passed to to_numpy, or None
+        :return: the converted column
+        """
+        if index is own_index:                          # The indices can be exported as they are
+            return indices
+        xs = [from_index(i) for i in indices.tolist()]
+        if index is None:
+            column = np.empty(len(xs), dtype=object)    # Assigned one by one, states may be tuples
+            for k, x in enumerate(xs):
+                column[k] = x
+            return column
+        return np.array([index(x) for x in xs], dtype=np.int64)
+
+    def Qs(self, state, actions):
+        """
+        Obtain all Q-values for multiple possible actions given the state
+        :param state: The obtained state
+        :param actions: A list of actions for which the Q-value should be obtained
+        :return: A dictionary mapping each action to the corresponding Q-value
+        """
+        row = self.table[self.state_index(state)]
+        return {a: row[self.action_index(a)] for a in actions}
+
+    def Qs_batch(self, states, actions) -> np.ndarray:
+        """
+        Obtain the Q-values of multiple possible actions for multiple states at once
+        :param states: A list of states
+        :param actions: A list of actions for which the Q-values should be obtained
+        :return: An array of shape (len(states), len(actions)) where entry [i, j] is Q(states[i], actions[j])
+        """
+        action_indices = np.fromiter((self.action_index(a) for a in actions), dtype=np.int64)
+        return self.table[np.ix_(self.state_indices(states), action_indices)]
+
+    def state_indices(self, states) -> np.ndarray:
+        """
+        :param states: An iterable of states
+        :return: An array containing the indices of the states
+        """
+        return np.fromiter((self.state_index(s) for s in states), dtype=np.int64)
+
+    def argmax(self, states) -> np.ndarray:
+        """
+        Get the index of the action with the highest Q-value for multiple states
+        :param states: An iterable of states
+        :return: An array containing the greedy action index for each state
+        """
+        return self.table[self.state_indices(states)].argmax(axis=1)
+
+    def max(self, states) -> np.ndarray:
+        """
+        Get the highest Q-value over all actions for multiple states
+        :param states: An iterable of states
+        :return: An array containing the maximal Q-value for each state
+        """
+        return self.table[self.state_indices(states)].max(axis=1)
+
+    def values_array(self) -> np.ndarray:
+        """
+        :return: The array of all Q-values, indexed by (state index, action index). Entries that were never set are 0
+        """
+        return self.table
+
 
 if __name__ == '__main__':
     from version5.core import Action, State
@@ -122,3 +361,16 @@ if __name__ == '__main__':
     print([v for v in table])
     print(len(table))
     print(table)
+
+    from version5.environments.easy21 import Easy21State, Easy21Action
+
+    dense = DenseQTable(Easy21State.NUM_STATES, Easy21Action.NUM_ACTIONS,
+                        Easy21State.from_index, Easy21Action.from_index)
+
+    dense[Easy21State(5, 3, False), Easy21Action(True)] = 1
+    dense[Easy21State(5, 3, False), Easy21Action(False)] += 2
+
+    print(len(dense))
+    print(dense.argmax([Easy21State(5, 3, False), Easy21State(6, 3, False)]))
+    print(dense.values_array()[Easy21State(5, 3, False).index()])
+    print(dense)
@@ -0,0 +1,429 @@
+import numpy as np
+
+
+class ReplayBuffer:
+    """
+        Replay memory backed by preallocated arrays that are used as a ring buffer. Once the buffer is full, each new
+        transition overwrites the oldest one
+
+        A transition consists of the model input of a state, the index of the performed action, the obtained reward,
+        the model input of the next state and whether the next state is terminal. The arrays are allocated when the
+        first transition is added, since the shape of the model inputs is not known before
+    """
+
+    def __init__(self, capacity: int, dtype=None, seed=None):
+        """
+        Create a new ReplayBuffer
+        :param capacity: The maximum number of transitions in the buffer
+        :param dtype: Optional data type in which the model inputs are stored (e.g. np.float32 to halve the memory
+                      footprint). If left unspecified, the data type of the first added model input is used
+        :param seed: Seed of the random number generator used for sampling. Can be an int, a SeedSequence or a numpy
+                     Generator. If left unspecified, the generator is seeded randomly
+        """
+        assert capacity > 0
+        self.capacity = capacity
+        self.dtype = dtype
+        self.rng = np.random.default_rng(seed)
+        self.index = 0                                  # Position at which the next transition is written
+        self.size = 0
+        self.states, self.next_states = None, None
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float64)
+        self.terminal = np.zeros(capacity, dtype=bool)
+
+    def _allocate(self, x: np.ndarray):
+        """
+        Allocate the arrays holding the model inputs
+        :param x: A model input of a single state
+        """
+        dtype = x.dtype if self.dtype is None else self.dtype
+        self.states = np.zeros((self.capacity,) + x.shape, dtype=dtype)
+        self.next_states = np.zeros((self.capacity,) + x.shape, dtype=dtype)
+
+    def __len__(self) -> int:
+        """
+        :return: The number of transitions in the buffer
+        """
+        return self.size
+
+    def add(self, x: np.ndarray, action: int, reward: float, x_p: np.ndarray, terminal: bool) -> int:
+        """
+        Add a transition to the buffer
+        :param x: The model input of the state
+        :param action: The index of the action performed on the state
+        :param reward: The reward obtained from performing the action
+        :param x_p: The model input of the resulting state
+        :param terminal: A boolean indicating whether the resulting state is terminal
+        :return: the position in the buffer at which the transition was stored
+        """
+        if self.states is None:
+            self._allocate(np.asarray(x))
+        i = self.index
+        self.states[i], self.actions[i], self.rewards[i] = x, action, reward
+        self.next_states[i], self.terminal[i] = x_p, terminal
+        self.index = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        return i
+
+    def add_states(self, s, action: int, reward: float, s_p, phi: callable) -> int:
+        """
+        Add a transition to the buffer, given by its states
+        :param s: The state
+        :param action: The index of the action performed on the state
+        :param reward: The reward obtained from performing the action
+        :param s_p: The resulting state
+        :param phi: Function that transforms a state into a model input (with a leading batch axis of size 1)
+        :return: the position in the buffer at which the transition was stored
+        """
+        return self.add(phi(s)[0], action, reward, phi(s_p)[0], s_p.is_terminal())
+
+    def get(self, ixs: np.ndarray) -> tuple:
+        """
+        Get the transitions at the given positions in the buffer
+        :param ixs: An array of positions
+        :return: A five-tuple of arrays (states, actions, rewards, next states, terminal), ready to be trained on
+        """
+        return self.states[ixs], self.actions[ixs], self.rewards[ixs], self.next_states[ixs], self.terminal[ixs]
+
+    def sample_indices(self, batch_size: int) -> tuple:
+        """
+        Sample the positions of a batch of transitions uniformly (with replacement)
+        :param batch_size: The number of transitions in the batch
+        :return: A two-tuple of
+                    - an array containing the positions of the sampled transitions
+                    - the importance-sampling weights of the transitions, or None since uniform samples need no
+                      correction
+        """
+        if self.size == 0:
+            raise Exception('Cannot sample from an empty replay buffer!')
+        oldest = self.index - self.size
+        return (oldest + self.rng.integers(self.size, size=batch_size)) % self.capacity, None
+
+    def sample(self, batch_size: int) -> tuple:
+        """
+        Sample a batch of transitions
+        :param batch_size: The number of transitions in the batch
+        :return: A five-tuple of arrays (states, actions, rewards, next states, terminal), ready to be trained on
+        """
+        ixs, _ = self.sample_indices(batch_size)
+        return self.get(ixs)
+
+    def update_priorities(self, ixs: np.ndarray, td_errors: np.ndarray):
+        """
+        Report the TD errors of sampled transitions back to the buffer. Uniform sampling ignores them
+        :param ixs: The positions of the transitions
+        :param td_errors: The TD errors of the transitions
+        """
+        pass
+
+
+class SumTree:
+    """
+        Binary tree in which every node holds the sum of its children, stored in a flat array (the children of node i
+        are nodes 2i and 2i + 1, the root is node 1). Leaves hold non-negative priorities. Updating a priority and
+        finding the leaf at a prefix sum both take O(log n) time, and both are vectorized over batches
+    """
+
+    def __init__(self, capacity: int):
+        """
+        Create a new SumTree with all priorities set to 0
+        :param capacity: The number of leaves (rounded up to a power of 2)
+        """
+        self.leaves = 1 << max(capacity - 1, 1).bit_length()
+        self.tree = np.zeros(2 * self.leaves)
+
+    @property
+    def total(self) -> float:
+        """
+        :return: The sum of all priorities
+        """
+        return self.tree[1]
+
+    def __getitem__(self, ixs):
+        """
+        :param ixs: A leaf index or an array of leaf indices
+        :return: The priorities of the leaves
+        """
+        return self.tree[np.asarray(ixs) + self.leaves]
+
+    def set(self, i: int, priority: float):
+        """
+        Set the priority of a single leaf
+        :param i: The index of the leaf
+        :param priority: The new priority
+        """
+        tree = self.tree
+        i += self.leaves
+        tree[i] = priority
+        i //= 2
+        while i:
+            tree[i] = tree[2 * i] + tree[2 * i + 1]
+            i //= 2
+
+    def update(self, ixs: np.ndarray, priorities: np.ndarray):
+        """
+        Set the priorities of multiple leaves
+        :param ixs: An array of leaf indices
+        :param priorities: The new priorities
+        """
+        nodes = np.asarray(ixs, dtype=np.int64) + self.leaves
+        self.tree[nodes] = priorities
+        nodes = nodes // 2
+        while len(nodes) and nodes[0] > 0:              # Recompute the sums level by level, up to the root. Parents
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]  # that appear twice get the same sum
+            nodes //= 2
+
+    def find(self, values: np.ndarray) -> np.ndarray:
+        """
+        Find the leaves at the given prefix sums
+        :param values: An array of values in [0, total)
+        :return: an array containing, for each value v, the first leaf i for which the sum of priorities 0..i exceeds v
+        """
+        nodes = np.ones(len(values), dtype=np.int64)
+        values = np.array(values, dtype=float)
+        while nodes[0] < self.leaves:                   # All leaves are at the same depth
+            left = self.tree[2 * nodes]
+            right = values >= left
+            values -= np.where(right, left, 0)
+            nodes = 2 * nodes + right
+        return nodes - self.leaves
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """
+        Replay buffer that samples transitions with probability proportional to their priority (|TD error| + epsilon)
+        ^ alpha, using a sum tree. New transitions get the highest priority seen so far, so they are sampled at least
+        once. The bias of prioritized sampling is corrected with importance-sampling weights (Schaul et al., 2016),
+        normalized by the largest weight in the batch
+    """
+
+    def __init__(self, capacity: int, alpha: float = 0.6, beta: float = 0.4, epsilon: float = 1e-6, dtype=None,
+                 seed=None):
+        """
+        Create a new PrioritizedReplayBuffer
+        :param capacity: The maximum number of transitions in the buffer
+        :param alpha: Prioritization exponent. 0 gives uniform sampling, 1 samples fully proportional to the TD errors
+        :param beta: Importance-sampling exponent. 1 fully corrects the bias of prioritized sampling. Can be changed
+                     during training (e.g. annealed towards 1)
+        :param epsilon: Small constant added to the TD errors, so every transition keeps a chance of being sampled
+        :param dtype: Optional data type in which the model inputs are stored
+        :param seed: Seed of the random number generator used for sampling
+        """
+        super().__init__(capacity, dtype, seed)
+        self.alpha, self.beta, self.epsilon = alpha, beta, epsilon
+        self.tree = SumTree(capacity)
+        self.max_priority = 1.0
+
+    def add(self, x: np.ndarray, action: int, reward: float, x_p: np.ndarray, terminal: bool) -> int:
+        """
+        Add a transition to the buffer, with the highest priority seen so far
+        :param x: The model input of the state
+        :param action: The index of the action performed on the state
+        :param reward: The reward obtained from performing the action
+        :param x_p: The model input of the resulting state
+        :param terminal: A boolean indicating whether the resulting state is terminal
+        :return: the position in the buffer at which the transition was stored
+        """
+        i = super().add(x, action, reward, x_p, terminal)
+        self.tree.set(i, self.max_priority)
+        return i
+
+    def sample_indices(self, batch_size: int) -> tuple:
+        """
+        Sample the positions of a batch of transitions proportional to their priorities. The batch is stratified: the
+        total priority is split into batch_size equal segments and one transition is sampled from each
+        :param batch_size: The number of transitions in the batch
+        :return: A two-tuple of
+                    - an array containing the positions of the sampled transitions
+                    - an array containing the importance-sampling weights of the transitions
+        """
+        if self.size == 0:
+            raise Exception('Cannot sample from an empty replay buffer!')
+        total = self.tree.total
+        values = (np.arange(batch_size) + self.rng.random(batch_size)) * (total / batch_size)
+        ixs = np.minimum(self.tree.find(values), self.size - 1)    # Guard against rounding past the last transition
+        p = self.tree[ixs] / total
+        weights = (self.size * p) ** -self.beta
+        return ixs, weights / weights.max()
+
+    def update_priorities(self, ixs: np.ndarray, td_errors: np.ndarray):
+        """
+        Set the priorities of sampled transitions from their TD errors
+        :param ixs: The positions of the transitions
+        :param td_errors: The TD errors of the transitions
+        """
+        priorities = (np.abs(td_errors) + self.epsilon) ** self.alpha
+        self.tree.update(ixs, priorities)
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+
+
+class FrameReplayBuffer(ReplayBuffer):
+    """
+        Replay buffer for visual environments that stores each frame only once, as uint8, in a circular frame array.
+        Transitions refer to their frames by id, so consecutive transitions share the frame of the state between them.
+        Frames are only converted to model inputs when a batch is taken from the buffer
+
+        When a frame is overwritten, the transitions that still refer to it are dropped. Each episode adds one frame
+        more than it has transitions, so the default frame capacity of capacity + stack holds slightly fewer than
+        capacity transitions. Pass a larger frame_capacity to always hold capacity transitions
+
+        With stack set to k > 1, states are given as their last k frames (see FrameStack), gathered from the stored
+        frames when a batch is taken. Stacking costs no memory per transition. At the start of an episode, the first
+        frame is repeated to fill the stack
+    """
+
+    def __init__(self, capacity: int, frame: callable, normalize: callable, frame_capacity: int = None,
+                 stack: int = 1, seed=None):
+        """
+        Create a new FrameReplayBuffer
+        :param capacity: The maximum number of transitions in the buffer
+        :param frame: Function that gets the frame of a state, as an array with values in [0, 255]
+        :param normalize: Function that transforms a uint8 array of frames (stacked along the first axis) into model
+                          inputs. With stack > 1, it receives an array of shape (n,) + frame shape + (stack,)
+        :param frame_capacity: The maximum number of frames in the buffer. Defaults to capacity + stack
+        :param stack: The number of frames in each state. The frame function should give the most recent frame
+        :param seed: Seed of the random number generator used for sampling
+        """
+        super().__init__(capacity, np.uint8, seed)
+        assert stack > 0
+        self.frame, self.normalize = frame, normalize
+        self.stack = stack
+        self.frame_capacity = capacity + stack if frame_capacity is None else frame_capacity
+        assert self.frame_capacity >= stack + 1
+        self.frames = None
+        self.frame_count = 0                            # Id of the next frame. Frame f is stored at f % frame_capacity
+        self.episode_starts = np.zeros(self.frame_capacity, dtype=np.int64)  # Id of the first frame of its episode
+        self.state_frames = np.zeros(capacity, dtype=np.int64)
+        self.next_frames = np.zeros(capacity, dtype=np.int64)
+        self._last_state, self._last_frame = None, -1   # The most recent next state, shared with the next transition
+
+    def add_frame(self, frame: np.ndarray, episode_start: int = None) -> int:
+        """
+        Add a frame to the buffer, overwriting the oldest frame if the buffer is full
+        :param frame: The frame, with values in [0, 255]
+        :param episode_start: The id of the first frame of the episode. If left unspecified, the frame starts a new
+                              episode
+        :return: the id of the frame
+        """
+        if self.frames is None:
+            frame = np.asarray(frame)
+            self.frames = np.zeros((self.frame_capacity,) + frame.shape, dtype=np.uint8)
+        f = self.frame_count
+        overwritten = f - self.frame_capacity + self.stack - 1  # Frame that a stack may no longer refer to
+        while self.size and self.state_frames[(self.index - self.size) % self.capacity] <= overwritten:
+            self.size -= 1                              # Drop the oldest transitions that refer to the frame
+        self.frames[f % self.frame_capacity] = frame
+        self.episode_starts[f % self.frame_capacity] = f if episode_start is None else episode_start
+        self.frame_count += 1
+        return f
+
+    def add_frames(self, x: int, action: int, reward: float, x_p: int, terminal: bool) -> int:
+        """
+        Add a transition to the buffer, given by the ids of its frames
+        :param x: The frame id of the state
+        :param action: The index of the action performed on the state
+        :param reward: The reward obtained from performing the action
+        :param x_p: The frame id of the resulting state
+        :param terminal: A boolean indicating whether the resulting state is terminal
+        :return: the position in the buffer at which the transition was stored
+        """
+        i = self.index
+        self.state_frames[i], self.actions[i], self.rewards[i] = x, action, reward
+        self.next_frames[i], self.terminal[i] = x_p, terminal
+        self.index = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        return i
+
+    def add(self, x: np.ndarray, action: int, reward: float, x_p: np.ndarray, terminal: bool) -> int:
+        """
+        Add a transition to the buffer, given by its frames. Both frames are stored, see add_states to share frames
+        between consecutive transitions
+        :param x: The frame of the state
+        :param action: The index of the action performed on the state
+        :param reward: The reward obtained from performing the action
+        :param x_p: The frame of the resulting state
+        :param terminal: A boolean indicating whether the resulting state is terminal
+        :return: the position in the buffer at which the transition was stored
+        """
+        x = self.add_frame(x)
+        return self.add_frames(x, action, reward, self.add_frame(x_p, x), terminal)
+
+    def add_states(self, s, action: int, reward: float, s_p, phi: callable = None) -> int:
+        """
+        Add a transition to the buffer, given by its states. If s is the resulting state of the previous transition,
+        its frame is not stored again
+        :param s: The state
+        :param action: The index of the action performed on the state
+        :param reward: The reward obtained from performing the action
+        :param s_p: The resulting state
+        :param phi: Ignored, frames are obtained with the frame function of this buffer
+        :return: the position in the buffer at which the transition was stored
+        """
+        x = self._last_frame if s is self._last_state else self.add_frame(self.frame(s))
+        x_p = self.add_frame(self.frame(s_p), self.episode_starts[x % self.frame_capacity])
+        self._last_state, self._last_frame = s_p, x_p
+        return self.add_frames(x, action, reward, x_p, s_p.is_terminal())
+
+    def get(self, ixs: np.ndarray) -> tuple:
+        """
+        Get the transitions at the given positions in the buffer
+        :param ixs: An array of positions
+        :return: A five-tuple of arrays (states, actions, rewards, next states, terminal), where the frames of the
+                 states are transformed into model inputs
+        """
+        x, x_p = self._gather(self.state_frames[ixs]), self._gather(self.next_frames[ixs])
+        return self.normalize(x), self.actions[ixs], self.rewards[ixs], self.normalize(x_p), self.terminal[ixs]
+
+    def _gather(self, ids: np.ndarray) -> np.ndarray:
+        """
+        Gather the frames of states
+        :param ids: The ids of the most recent frames of the states
+        :return: an array containing the frames, of shape (n,) + frame shape + (stack,) if stack > 1
+        """
+        if self.stack == 1:
+            return self.frames[ids % self.frame_capacity]
+        ids = ids[:, None] - np.arange(self.stack - 1, -1, -1)             # Oldest frame first, like FrameStack
+        starts = self.episode_starts[ids[:, -1:] % self.frame_capacity]
+        frames = self.frames[np.maximum(ids, starts) % self.frame_capacity]  # Repeat the first frame of the episode
+        return np.moveaxis(frames, 1, -1)
+
+
+if __name__ == '__main__':
+    import time
+
+    _buffer = ReplayBuffer(capacity=10 ** 6, dtype=np.float32, seed=0)
+    _t = time.time()
+    for _i in range(10 ** 6):
+        _x = np.full(4, _i, dtype=np.float32)
+        _buffer.add(_x, _i % 2, 1.0, _x + 1, _i % 100 == 0)
+    print('Added 1M transitions in {:.3f}s'.format(time.time() - _t))
+
+    _t = time.time()
+    for _ in range(10000):
+        _batch = _buffer.sample(32)
+    print('Sampled 10000 minibatches of 32 in {:.3f}s'.format(time.time() - _t))
+    print([_a.shape for _a in _batch], _buffer.states.nbytes + _buffer.next_states.nbytes)
+
+    class _State:
+        def __init__(self, frame, terminal):
+            self.frame, self.terminal = frame, terminal
+
+        def is_terminal(self):
+            return self.terminal
+
+    _frames = ReplayBuffer(capacity=10000, seed=0)                  # Compare normalized float frames to uint8 frames
+    _visual = FrameReplayBuffer(capacity=10000, frame=lambda s: s.frame,
+                                normalize=lambda f: f.reshape(f.shape + (1,)).astype(np.float32) / 256, seed=0)
+    _phi = lambda s: np.reshape(s.frame / 256, (1, 48, 48, 1))
+    _rng = np.random.default_rng(0)
+    for _episode in range(200):
+        _s = _State(_rng.integers(256, size=(48, 48)), False)
+        for _t in range(60):
+            _s_p = _State(_rng.integers(256, size=(48, 48)), _t == 59)
+            _frames.add_states(_s, 0, 0.0, _s_p, _phi)
+            _visual.add_states(_s, 0, 0.0, _s_p)
+            _s = _s_p
+    _ixs = _visual.sample_indices(32)[0]
+    print(len(_frames), len(_visual), np.allclose(_visual.get(_ixs)[3], _frames.get(_ixs)[3]))
+    print('Frame memory: {:.1f}MB as floats, {:.1f}MB as shared uint8 frames'.format(
+        (_frames.states.nbytes + _frames.next_states.nbytes) / 2 ** 20, _visual.frames.nbytes / 2 ** 20))
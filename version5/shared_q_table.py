@@ -0,0 +1,272 @@
+import multiprocessing
+import os
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from version5.core import _index
+from version5.q_table import DenseQTable
+
+
+class SharedQTable(DenseQTable):
+    """
+        Dense Q Table implementation backed by shared memory, so multiple processes can learn in and read from the same
+        table without serialization
+
+        Reads never take a lock. Writes can optionally be protected by striped locks (one lock per group of states), and
+        snapshot() gives evaluators a consistent private copy of the table. The table can be passed to other processes
+        as an argument of multiprocessing.Process, or opened by name with attach()
+    """
+
+    def __init__(self, num_states: int, num_actions: int, state_from_index: callable, action_from_index: callable,
+                 state_index: callable = _index, action_index: callable = _index, num_locks: int = 16,
+                 name: str = None, context=None):
+        """
+        Create a new Shared Q Table
+        :param num_states: The number of states in the state space
+        :param num_actions: The number of actions in the action space
+        :param state_from_index: Function that maps a state index to its state
+        :param action_from_index: Function that maps an action index to its action
+        :param state_index: Function that maps a state to its index in [0, num_states). Defaults to state.index()
+        :param action_index: Function that maps an action to its index in [0, num_actions). Defaults to action.index()
+        :param num_locks: The number of locks that protect writes. Set to 0 for unprotected writes
+        :param name: Optional name of the shared memory block. If left unspecified, a unique name is generated
+        :param context: Optional multiprocessing context in which the locks are created. Should match the context of
+                        the processes the table is passed to
+        """
+        context = multiprocessing if context is None else context
+        self.state_index, self.action_index = state_index, action_index
+        self.state_from_index, self.action_from_index = state_from_index, action_from_index
+        self.shape = (num_states, num_actions)
+        self.locks = [context.Lock() for _ in range(num_locks)]
+        self._owner = os.getpid()                       # Only the creating process frees the shared memory block
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=num_states * num_actions * 9)
+        self._map()
+        self.table[:] = 0
+        self.stored[:] = False
+
+    @classmethod
+    def attach(cls, name: str, num_states: int, num_actions: int, state_from_index: callable,
+               action_from_index: callable, state_index: callable = _index,
+               action_index: callable = _index) -> 'SharedQTable':
+        """
+        Open an existing Shared Q Table by the name of its shared memory block. Locks cannot be shared by name, so
+        writes through the opened table are not protected
+        :param name: The name of the shared memory block (see SharedQTable.name)
+        :param num_states: The number of states in the state space
+        :param num_actions: The number of actions in the action space
+        :param state_from_index: Function that maps a state index to its state
+        :param action_from_index: Function that maps an action index to its action
+        :param state_index: Function that maps a state to its index in [0, num_states). Defaults to state.index()
+        :param action_index: Function that maps an action to its index in [0, num_actions). Defaults to action.index()
+        :return: the opened table
+        """
+        table = cls.__new__(cls)
+        table.__setstate__({'name': name, 'shape': (num_states, num_actions), 'locks': [],
+                            'state_index': state_index, 'action_index': action_index,
+                            'state_from_index': state_from_index, 'action_from_index': action_from_index})
+        return table
+
+    def _map(self):
+        """
+        Create the arrays that view the shared memory block
+        """
+        n = self.shape[0] * self.shape[1]
+        self.table = np.ndarray(shape=self.shape, dtype=np.float64, buffer=self.shm.buf)
+        self.stored = np.ndarray(shape=self.shape, dtype=bool, buffer=self.shm.buf, offset=n * 8)
+
+    @property
+    def name(self) -> str:
+        """
+        :return: The name of the shared memory block
+        """
+        return self.shm.name
+
+    def __getstate__(self) -> dict:
+        return {'name': self.shm.name, 'shape': self.shape, 'locks': self.locks,
+                'state_index': self.state_index, 'action_index': self.action_index,
+                'state_from_index': self.state_from_index, 'action_from_index': self.action_from_index}
+
+    def __setstate__(self, state: dict):
+        self.state_index, self.action_index = state['state_index'], state['action_index']
+        self.state_from_index, self.action_from_index = state['state_from_index'], state['action_from_index']
+        self.shape = state['shape']
+        self.locks = state['locks']
+        self._owner = None
+        self.shm = _open(state['name'])
+        self._map()
+
+    def _lock(self, i: int):
+        """
+        :param i: A state index
+        :return: The lock protecting the state, or None if writes are not protected
+        """
+        return self.locks[i % len(self.locks)] if self.locks else None
+
+    def __setitem__(self, key: tuple, value: float):
+        """
+        Set a Q-value for a given (state, action) pair
+        :param key: Two-tuple of (state, action)
+        :param value: Q-value corresponding to the key
+        """
+        s, a = key
+        i, j = self.state_index(s), self.action_index(a)
+        lock = self._lock(i)
+        if lock is None:
+            self.table[i, j] = value
+            self.stored[i, j] = True
+        else:
+            with lock:
+                self.table[i, j] = value
+                self.stored[i, j] = True
+
+    def add(self, key: tuple, delta: float):
+        """
+        Add a value to the Q-value of a (state, action) pair. Unlike Q[s, a] += delta, the read and write happen under
+        the same lock, so concurrent updates are not lost
+        :param key: Two-tuple of (state, action)
+        :param delta: The value to be added
+        """
+        s, a = key
+        i, j = self.state_index(s), self.action_index(a)
+        lock = self._lock(i)
+        if lock is None:
+            self.table[i, j] += delta
+            self.stored[i, j] = True
+        else:
+            with lock:
+                self.table[i, j] += delta
+                self.stored[i, j] = True
+
+    def __delitem__(self, key: tuple):
+        """
+        Remove an entry from this table
+        :param key: The (state, action) pair of the entry that should be removed
+        """
+        s, _ = key
+        lock = self._lock(self.state_index(s))
+        if lock is None:
+            super().__delitem__(key)
+        else:
+            with lock:
+                super().__delitem__(key)
+
+    def snapshot(self) -> DenseQTable:
+        """
+        Copy this table into private memory. All locks are held while copying, so no write is half-visible in the copy
+        :return: a DenseQTable containing a copy of all entries
+        """
+        for lock in self.locks:
+            lock.acquire()
+        try:
+            table, stored = self.table.copy(), self.stored.copy()
+        finally:
+            for lock in reversed(self.locks):
+                lock.release()
+        copy = DenseQTable(self.shape[0], self.shape[1], self.state_from_index, self.action_from_index,
+                           self.state_index, self.action_index)
+        copy.table, copy.stored = table, stored
+        return copy
+
+    def close(self):
+        """
+        Close this process' view of the shared memory block. The owner also frees the block
+        """
+        del self.table, self.stored
+        self.shm.close()
+        if self._owner == os.getpid():
+            self.shm.unlink()
+
+
+def _open(name: str) -> shared_memory.SharedMemory:
+    """
+    Open an existing shared memory block without registering it with the resource tracker of this process. A process
+    that only attaches to the block must not track it, since before Python 3.13 the tracker of a process unlinks all
+    blocks registered with it when the process exits, freeing the block while the owner still uses it
+    :param name: The name of the shared memory block
+    :return: the opened block
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args: None      # Equivalent of track=False. Unregistering after the fact would
+    try:                                                # drop the owner's registration from a tracker shared with it
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _learn(table: SharedQTable, seed, num_iter: int):
+    """
+    Let a worker learn in a shared table with every-visit MonteCarlo control. All updates go through table.add, so
+    updates of different workers to the same entry are not lost
+    :param table: The shared table
+    :param seed: Seed of the worker
+    :param num_iter: The number of episodes the worker should run
+    """
+    from collections import defaultdict
+    from version5.core import spawn_seeds
+    from version5.environments.easy21 import Easy21
+    from version5.policy import EpsilonGreedyPolicy
+
+    env_seed, policy_seed = spawn_seeds(seed, 2)
+    env, n = Easy21(seed=env_seed), defaultdict(int)            # Visit counts are kept per worker
+    pi = table.derive_policy(EpsilonGreedyPolicy, env.valid_actions_from, epsilon=lambda x: 100 / (100 + n[x]),
+                             seed=policy_seed)
+    for _ in range(num_iter):
+        s, e = env.reset(), []
+        while not s.is_terminal():                              # Execute an episode
+            a = pi.sample(s)
+            s_p, r = env.step(a)
+            e.append((s, a, r))
+            s = s_p
+
+        g = 0
+        for s, a, r in reversed(e):
+            g = g + r
+            n[s] += 1
+            n[s, a] += 1
+            table.add((s, a), (g - table[s, a]) / n[s, a])      # Atomic update, based on a lock-free read
+    table.close()
+
+
+def _evaluate(name: str):
+    """
+    Evaluate the greedy policy of an Easy21 table that lives in another process
+    :param name: The name of the shared memory block of the table
+    """
+    from version5.agents.dynamic_programming import evaluate_policy
+    from version5.environments.easy21 import Easy21, Easy21State, Easy21Action
+    from version5.policy import GreedyPolicy
+
+    table = SharedQTable.attach(name, Easy21State.NUM_STATES, Easy21Action.NUM_ACTIONS,
+                                Easy21State.from_index, Easy21Action.from_index)
+    print(evaluate_policy(table.derive_policy(GreedyPolicy, Easy21.valid_actions_from), Easy21())[1])
+    table.close()
+
+
+if __name__ == '__main__':
+    import subprocess
+    import time
+    from version5.core import spawn_seeds
+    from version5.environments.easy21 import Easy21State, Easy21Action
+
+    if len(sys.argv) > 1:                                       # Evaluate a table that is opened by name
+        _evaluate(sys.argv[1])
+        sys.exit()
+
+    _table = SharedQTable(Easy21State.NUM_STATES, Easy21Action.NUM_ACTIONS,
+                          Easy21State.from_index, Easy21Action.from_index)
+
+    _workers = [multiprocessing.Process(target=_learn, args=(_table, _seed, 100000)) for _seed in spawn_seeds(0, 4)]
+    for _worker in _workers:
+        _worker.start()
+    for _worker in _workers:
+        _worker.join()
+
+    print(len(_table.snapshot()))
+    subprocess.run([sys.executable, '-m', 'version5.shared_q_table', _table.name], check=True)
+    time.sleep(1)                                               # Let the resource tracker of the evaluator shut down
+    _open(_table.name).close()                                  # The block outlives the evaluator
+    _table.close()